@@ -1,26 +1,101 @@
 #!/usr/bin/env python
 """Extract data from a Service Bus topic and loading to blob storage."""
+import base64
+import bisect
+import collections
+import concurrent.futures
 import datetime
+import decimal
+import hashlib
+import importlib
+import json
 import logging
+import math
 import os
+import random
+import re
 import sys
+import threading
 import time
+import urllib.parse
+import uuid
 
-import azure.functions as func
-import azure.storage
-import azure.storage.blob
-import smart_open
-from azure.servicebus import (AutoLockRenewer, ServiceBusClient,
-                              ServiceBusMessage, ServiceBusSubQueue)
-from azure.servicebus.exceptions import ServiceBusError
+from azure.core.exceptions import (AzureError, ServiceRequestError,
+                                   ServiceResponseError)
+from azure.servicebus import (NEXT_AVAILABLE_SESSION, AutoLockRenewer,
+                              ServiceBusClient, ServiceBusMessage,
+                              ServiceBusSubQueue)
+from azure.servicebus.amqp import AmqpMessageBodyType
+from azure.servicebus.exceptions import (OperationTimeoutError,
+                                         ServiceBusError,
+                                         ServiceBusServerBusyError)
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKLOG_POLL_SECONDS = float(os.getenv('BACKLOG_POLL_SECONDS', '30'))
+DUPLICATE_WINDOW = int(os.getenv('DUPLICATE_WINDOW', '100000'))
+MAX_CONCURRENT_SESSIONS = int(os.getenv('MAX_CONCURRENT_SESSIONS', '8'))
 MAX_EMPTY_RECEIVES = int(os.getenv('MAX_EMPTY_RECEIVES', '3'))
 MAX_MESSAGES_IN_BATCH = int(os.getenv('MAX_MESSAGES_IN_BATCH', '500'))
 MAX_RUNTIME_SECONDS = int(os.getenv('MAX_RUNTIME_SECONDS', '0'))
+RETRY_BASE_SECONDS = float(os.getenv('RETRY_BASE_SECONDS', '1'))
+RETRY_MAX_SECONDS = float(os.getenv('RETRY_MAX_SECONDS', '60'))
+STORAGE_MODULES = ('azure.storage.blob', 'smart_open')
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv('SHUTDOWN_TIMEOUT_SECONDS', '20'))
 WAIT_TIME_SECONDS = int(os.getenv('WAIT_TIME_SECONDS', '5'))
+LOCK_RENEWAL_SECONDS = 120
+MAX_LIST_PREFIXES = 1000
+THROTTLED_STATUS_CODES = (429, 503)
+AMQP_HEADER_FIELDS = (
+    ('delivery_count', 'delivery_count'),
+    ('time_to_live', 'time_to_live_ms')
+)
+AMQP_PROPERTY_FIELDS = (
+    ('message_id', 'message_id'),
+    ('correlation_id', 'correlation_id'),
+    ('group_id', 'session_id'),
+    ('reply_to_group_id', 'reply_to_session_id'),
+    ('content_type', 'content_type'),
+    ('subject', 'subject'),
+    ('to', 'to'),
+    ('reply_to', 'reply_to')
+)
+MESSAGE_FIELDS = (
+    ('sequence_number', 'sequence_number'),
+    ('enqueued_sequence_number', 'enqueued_sequence_number'),
+    ('enqueued_time_utc', 'enqueued_time_utc'),
+    ('scheduled_enqueue_time_utc', 'scheduled_enqueue_time_utc'),
+    ('partition_key', 'partition_key'),
+    ('dead_letter_reason', 'dead_letter_reason'),
+    ('dead_letter_error_description', 'dead_letter_error_description'),
+    ('dead_letter_source', 'dead_letter_source')
+)
+PATH_TOKENS = (
+    ('YYYY', 'year'),
+    ('MM', 'month'),
+    ('dd', 'day'),
+    ('HH', 'hour'),
+    ('mm', 'minute')
+)
+# The blob file extension of each codec (smart_open compresses according to the extension).
+CODECS = {
+    'bz2': '.bin.bz2',
+    'gzip': '.bin.gz',
+    'none': '.bin',
+    'xz': '.bin.xz'
+}
 logging.basicConfig()
 logger = logging.getLogger(os.path.basename(__file__))
+_duplicate_filters = {}
+_duplicate_filters_lock = threading.Lock()
 _message_count = 0
+_first_message_seconds = None
+_import_seconds = {}
+_import_lock = threading.Lock()
+_IMPORTED_AT = time.monotonic()
 
 
 class MockTimer:
@@ -30,14 +105,264 @@ class MockTimer:
     Used by the main_wrapper function to call main when not part
     of the Azure Function App tooling.
 
+    Parameters
+    ----------
+    shutdown : Shutdown, optional
+        The shutdown to be observed by main, by default one that is never
+        requested.
+    config : TopicConfig, optional
+        The configuration of the topic to be archived by main, by default
+        one created from the environment variables.
+
     Attributes
     ----------
     past_due : bool
         Always set to False.
+    shutdown : Shutdown
+        The shutdown to be observed by main.
+    config : TopicConfig
+        The configuration of the topic to be archived by main.
     """
 
-    def __init__(self):
+    def __init__(self, shutdown: 'Shutdown' = None, config: 'TopicConfig' = None):
         self.past_due = False
+        self.shutdown = shutdown
+        self.config = config
+
+
+class NullCounter:
+    """
+    A counter that discards its increments.
+
+    The values of COUNTERS are NullCounters until they are replaced (e.g. by
+    prometheus_client.Counter objects in multi-topic-entrypoint.py), so that
+    this module does not depend on a metrics library.
+    """
+
+    def inc(self, amount: float = 1) -> None:
+        """Discard an increment."""
+
+
+COUNTERS = {
+    'backoff_seconds': NullCounter(),
+    'duplicate_messages': NullCounter(),
+    'throttle_events': NullCounter()
+}
+
+
+class Shutdown:
+    """
+    A cancellation that is shared with the extract/load loop.
+
+    When a shutdown is requested, no more messages are received and any
+    in-flight upload is given until the deadline to complete.
+
+    Parameters
+    ----------
+    timeout_seconds : float, optional
+        How long in-flight uploads are allowed to complete for once a
+        shutdown has been requested, by default SHUTDOWN_TIMEOUT_SECONDS.
+    """
+
+    def __init__(self, timeout_seconds: float = SHUTDOWN_TIMEOUT_SECONDS):
+        self.timeout_seconds = timeout_seconds
+        self.deadline = None
+        self._event = threading.Event()
+
+    def is_requested(self) -> bool:
+        """
+        Check if a shutdown has been requested.
+
+        Returns
+        -------
+        bool
+            True if a shutdown has been requested.
+        """
+        return self._event.is_set()
+
+    def remaining(self) -> float:
+        """
+        Get the time remaining until the deadline.
+
+        Returns
+        -------
+        float
+            The number of seconds until the deadline (never negative) or None
+            if a shutdown has not been requested.
+        """
+        if self.deadline is None:
+            return None
+
+        return max(0.0, self.deadline - time.monotonic())
+
+    def request(self) -> None:
+        """Request a shutdown, starting the deadline if not already started."""
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.timeout_seconds
+
+        self._event.set()
+
+    def wait(self, timeout_seconds: float) -> bool:
+        """
+        Sleep until the timeout or until a shutdown is requested.
+
+        Parameters
+        ----------
+        timeout_seconds : float
+            The maximum number of seconds to sleep for.
+
+        Returns
+        -------
+        bool
+            True if a shutdown has been requested.
+        """
+        return self._event.wait(timeout_seconds)
+
+
+class Throttle:
+    """
+    Back off from errors and scale down the load on Service Bus and storage.
+
+    After each error, the caller sleeps for a random time (full jitter) of
+    up to base_seconds doubled for each consecutive error, capped at
+    max_seconds.  When the error shows that Service Bus or storage is
+    throttling, the batch size and concurrency are also halved (down to
+    one) and they are recovered by a tenth of their maximums after each
+    successful batch (additive increase, multiplicative decrease).
+
+    Parameters
+    ----------
+    base_seconds : float, optional
+        The maximum backoff after the first error, by default
+        RETRY_BASE_SECONDS.
+    max_seconds : float, optional
+        The cap on the backoff, by default RETRY_MAX_SECONDS.
+    """
+
+    RECOVERY_STEP = 0.1
+
+    def __init__(self, base_seconds: float = RETRY_BASE_SECONDS, max_seconds: float = RETRY_MAX_SECONDS):
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.error_count = 0
+        self.scale = 1.0
+        self.throttle_count = 0
+        self.backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def backoff(self, error: Exception, shutdown: Shutdown) -> None:
+        """
+        Record an error and sleep before the operation is retried.
+
+        Parameters
+        ----------
+        error : Exception
+            The error that occurred.
+        shutdown : Shutdown
+            The sleep is cut short if a shutdown is requested.
+        """
+        delay = self.failure(self.is_throttled(error))
+        logger.debug(f'Backing off for {delay:.3f} seconds (scale {self.scale:.2f}).')
+        start = time.monotonic()
+        shutdown.wait(delay)
+        elapsed_seconds = time.monotonic() - start
+        COUNTERS['backoff_seconds'].inc(elapsed_seconds)
+
+        with self._lock:
+            self.backoff_seconds += elapsed_seconds
+
+    def failure(self, is_throttled: bool) -> float:
+        """
+        Record an error.
+
+        Parameters
+        ----------
+        is_throttled : bool
+            True if the error shows that the request was throttled.
+
+        Returns
+        -------
+        float
+            The number of seconds to back off for.
+        """
+        with self._lock:
+            self.error_count += 1
+
+            if is_throttled:
+                self.throttle_count += 1
+                self.scale /= 2
+                COUNTERS['throttle_events'].inc()
+
+            ceiling = min(self.max_seconds, self.base_seconds * 2 ** (self.error_count - 1))
+
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    def is_throttled(error: Exception) -> bool:
+        """
+        Check if an error shows that Service Bus or storage is throttling.
+
+        Parameters
+        ----------
+        error : Exception
+            The error that occurred.
+
+        Returns
+        -------
+        bool
+            True for a Service Bus server busy error or a storage response
+            with a status code of 429 or 503.
+        """
+        if isinstance(error, ServiceBusServerBusyError):
+            return True
+
+        return getattr(error, 'status_code', None) in THROTTLED_STATUS_CODES
+
+    @staticmethod
+    def is_transient(error: Exception) -> bool:
+        """
+        Check if an error is likely to succeed if the operation is retried.
+
+        Parameters
+        ----------
+        error : Exception
+            The error that occurred.
+
+        Returns
+        -------
+        bool
+            True for throttling (see is_throttled), connection errors and
+            server errors (an HTTP status code of 500 or above).
+        """
+        if Throttle.is_throttled(error) or isinstance(error, (ServiceRequestError, ServiceResponseError)):
+            return True
+
+        return (getattr(error, 'status_code', None) or 0) >= 500
+
+    def scaled(self, maximum: int) -> int:
+        """
+        Scale a batch size or concurrency by the current throttling.
+
+        Parameters
+        ----------
+        maximum : int
+            The configured value.
+
+        Returns
+        -------
+        int
+            The value to use now, which is at least one.
+        """
+        return max(1, round(maximum * self.scale))
+
+    def success(self) -> None:
+        """Record a success, recovering the scale a step at a time."""
+        with self._lock:
+            self.error_count = 0
+            self.scale = min(1.0, self.scale + self.RECOVERY_STEP)
+
+
+THROTTLE = Throttle()
 
 
 class LoadURI:
@@ -54,16 +379,29 @@ class LoadURI:
         The name of the topic to extract data from.
     path_format : str
         The path format to be appended to the topics_directory.
+    sub_directory : str, optional
+        A directory between the topic name and the path format (e.g.
+        "deadletter"), by default none.
+    codec : str, optional
+        The compression of the blobs (one of CODECS), by default "gzip".
     """
 
-    def __init__(self, container_name: str, topics_directory: str, topic_name: str, path_format: str):
+    def __init__(self, container_name: str, topics_directory: str, topic_name: str, path_format: str,
+                 sub_directory: str = '', codec: str = 'gzip'):
         self.container_name = container_name
         self.topics_directory = topics_directory
         self.topic_name = topic_name
         self.path_format = path_format
-        self.prefix = f'azure://{self.container_name}/{self.topics_directory}/{self.topic_name}/'
+        self.sub_directory = sub_directory
+        self.codec = codec
+        self.blob_prefix = f'{self.topics_directory}/{self.topic_name}/'
+
+        if sub_directory:
+            self.blob_prefix += f'{sub_directory}/'
 
-    def uri(self, offset: int, timestamp: datetime.datetime) -> str:
+        self.prefix = f'azure://{self.container_name}/{self.blob_prefix}'
+
+    def uri(self, offset: int, timestamp: datetime.datetime, session_id: str = None) -> str:
         """
         Generate the path for the uniform resource identifer (URI).
 
@@ -73,39 +411,228 @@ class LoadURI:
             The offset of the latest message on the topic.
         timestamp : datetime.datetime
             The timestamp of the latest message on the topic.
+        session_id : str, optional
+            The session that the messages were received from.  If set, the
+            (URL quoted) session ID is included in the file name.
 
         Returns
         -------
         str
             The URI to load the data to.
         """
-        path_format = self.path_format \
+        path_format = self.render(self.path_format, timestamp)
+        session = '' if session_id is None else urllib.parse.quote(session_id, safe='') + '+'
+        uri = self.prefix + path_format + f'/{self.topic_name}+{session}{offset:019}{CODECS[self.codec]}'
+        return uri
+
+    def granularity(self) -> str:
+        """
+        Get the finest time unit that the path format partitions on.
+
+        Only units that are preceded by all of the coarser units are
+        considered (e.g. "hour" is not a partition if there is no "day").
+
+        Returns
+        -------
+        str
+            One of "year", "month", "day", "hour" or "minute".  None if the
+            path format does not contain a year.
+        """
+        response = None
+
+        for token, unit in PATH_TOKENS:
+            if token not in self.path_format:
+                break
+
+            response = unit
+
+        return response
+
+    def parse(self, blob_name: str) -> tuple[int, datetime.datetime]:
+        """
+        Parse a blob name that was created with this load URI.
+
+        Parameters
+        ----------
+        blob_name : str
+            The name of the blob within the container.
+
+        Returns
+        -------
+        tuple[int, datetime.datetime]
+            The offset and the (truncated) timestamp encoded in the blob
+            name.  The timestamp is None if the path format does not contain
+            a year.  If the blob name does not match, (None, None) is
+            returned.
+        """
+        match = self.pattern().match(blob_name)
+
+        if match is None:
+            return None, None
+
+        fields = match.groupdict()
+        offset = int(fields.pop('offset'))
+
+        if 'year' not in fields:
+            return offset, None
+
+        timestamp = datetime.datetime(
+            int(fields['year']),
+            int(fields.get('month', 1)),
+            int(fields.get('day', 1)),
+            int(fields.get('hour', 0)),
+            int(fields.get('minute', 0))
+        )
+        return offset, timestamp
+
+    def pattern(self) -> re.Pattern:
+        """
+        Get a regular expression that matches the blob names of this load URI.
+
+        Returns
+        -------
+        re.Pattern
+            A compiled regular expression with named groups for the offset
+            and each of the time units in the path format.
+        """
+        path_regex = re.escape(self.path_format)
+
+        for token, unit in PATH_TOKENS:
+            group = f'(?P<{unit}>\\d{{{len(token)}}})'
+            path_regex = path_regex.replace(token, group, 1).replace(token, f'(?P={unit})')
+
+        regex = re.escape(self.blob_prefix) + path_regex + re.escape(f'/{self.topic_name}+')
+        return re.compile(regex + r'(?:[^/+]+\+)?(?P<offset>\d{19})' + re.escape(CODECS[self.codec]) + '$')
+
+    def prefixes(self, start: datetime.datetime, end: datetime.datetime) -> list[str]:
+        """
+        Get the blob name prefixes to list for a time range.
+
+        The prefixes are generated at the finest granularity of the path
+        format that keeps the number of prefixes within MAX_LIST_PREFIXES,
+        so that only the directories for the time range are listed.
+
+        Parameters
+        ----------
+        start : datetime.datetime
+            The start of the time range.
+        end : datetime.datetime
+            The end of the time range (inclusive).
+
+        Returns
+        -------
+        list[str]
+            The prefixes of the blob names within the container.
+        """
+        for unit in reversed(self._units()):
+            timestamps = time_buckets(start, end, unit, MAX_LIST_PREFIXES)
+
+            if timestamps is not None:
+                path_format = self._truncated_path_format(unit)
+                return list(dict.fromkeys(self.blob_prefix + self.render(path_format, ts) for ts in timestamps))
+
+        return [self.blob_prefix]
+
+    @staticmethod
+    def render(path_format: str, timestamp: datetime.datetime) -> str:
+        """
+        Substitute the time tokens within a path format.
+
+        Parameters
+        ----------
+        path_format : str
+            The path format containing the tokens to be substituted.
+        timestamp : datetime.datetime
+            The timestamp to take the values from.
+
+        Returns
+        -------
+        str
+            The path format with the tokens replaced.
+        """
+        return path_format \
             .replace('YYYY', str(timestamp.year)) \
             .replace('MM', f'{timestamp.month:02}') \
             .replace('dd', f'{timestamp.day:02}') \
             .replace('HH', f'{timestamp.hour:02}') \
             .replace('mm', f'{timestamp.minute:02}')
-        uri = self.prefix + path_format + f'/{self.topic_name}+{offset:019}.bin.gz'
-        return uri
+
+    def _units(self) -> list[str]:
+        granularity = self.granularity()
+        units = [unit for _, unit in PATH_TOKENS]
+        return units[:units.index(granularity) + 1] if granularity else []
+
+    def _truncated_path_format(self, unit: str) -> str:
+        token = dict((u, t) for t, u in PATH_TOKENS)[unit]
+        return self.path_format[:self.path_format.index(token) + len(token)]
 
 
 class Extractor:
-    """Extract data from Service Bus."""
+    """
+    Extract data from Service Bus.
 
-    def __init__(self, connection_string: str, topic_name: str, subscription_name: str,
-                 check_for_dead_letter_messages: bool):
+    Parameters
+    ----------
+    connection_string : str
+        The connection string for the Service Bus namespace.
+    config : TopicConfig
+        The configuration of the topic/subscription to extract data from.
+    session_id : str, optional
+        The session to receive from for session-enabled subscriptions.  Set
+        to NEXT_AVAILABLE_SESSION to accept the next available session.  A
+        session extractor is finished after a single empty receive so that
+        idle sessions are released promptly.
+    sub_queue : ServiceBusSubQueue, optional
+        The sub-queue of the subscription to receive from (e.g.
+        ServiceBusSubQueue.DEAD_LETTER), by default the subscription itself.
+    client : ServiceBusClient, optional
+        An open client to create the receiver with (e.g. one shared by the
+        sessions drained by a worker), by default a new client created from
+        the connection string.  A client that is passed in is not closed.
+    renewer : AutoLockRenewer, optional
+        A lock renewer to register the locks with, by default a new renewer.
+        A renewer that is passed in is not closed.
+    """
+
+    def __init__(self, connection_string: str, config: 'TopicConfig', session_id: str = None,
+                 sub_queue: ServiceBusSubQueue = None, client: ServiceBusClient = None,
+                 renewer: AutoLockRenewer = None):
         self.finished = False
-        self.client = ServiceBusClient.from_connection_string(connection_string)
-        self.topic_name = topic_name
-        self.subscription_name = subscription_name
+        self.is_connection_owner = client is None
+        self.client = ServiceBusClient.from_connection_string(connection_string) if client is None else client
+        self.config = config
+        self.topic_name = config.topic_name
+        self.subscription_name = config.subscription_name
+        self.session_id = session_id
         self.receiver = self.client.get_subscription_receiver(
-            topic_name,
-            subscription_name,
-            prefetch_count=MAX_MESSAGES_IN_BATCH * 2
+            config.topic_name,
+            config.subscription_name,
+            session_id=session_id,
+            sub_queue=sub_queue,
+            max_wait_time=config.wait_time_seconds,
+            prefetch_count=config.max_messages_in_batch * 2
         )
-        self.renewer = AutoLockRenewer()
+        self.renewer = AutoLockRenewer() if renewer is None else renewer
+        self.is_session_lock_registered = False
+        self.lock_deadline = None
+        self.no_session_available = False
         self.empty_receive_count = 0
-        self.check_for_dead_letter_messages = check_for_dead_letter_messages
+        self.max_empty_receives = config.max_empty_receives if session_id is None else 1
+        self.check_for_dead_letter_messages = config.check_for_dead_letter_messages and sub_queue is None
+
+    def abandon_messages(self, messages: list[ServiceBusMessage]) -> None:
+        """
+        Abandon messages so that they are redelivered straight away.
+
+        Parameters
+        ----------
+        messages : list[ServiceBusMessage]
+            The messages to be abandoned.
+        """
+        for message in messages:
+            self.receiver.abandon_message(message)
+
+        logger.warning(f'Abandoned {len(messages):,} messages on {self.topic_name}.')
 
     def accept_messages(self, messages: list[ServiceBusMessage]) -> None:
         """Accept the messages in the current buffer."""
@@ -113,21 +640,17 @@ class Extractor:
             self.receiver.complete_message(message)
 
     def close(self) -> None:
-        """Close the Service Bus Resources."""
-        try:
-            self.renewer.close()
-        except (AttributeError, ServiceBusClient) as ex:
-            logger.warning(f'An error occurred while closing the renewer: {ex}')
+        """Close the Service Bus Resources (the renewer and client only if this extractor created them)."""
+        resources = [('receiver', self.receiver)]
 
-        try:
-            self.receiver.close()
-        except (AttributeError, ServiceBusClient) as ex:
-            logger.warning(f'An error occurred while closing the receiver: {ex}')
+        if self.is_connection_owner:
+            resources = [('renewer', self.renewer), *resources, ('client', self.client)]
 
-        try:
-            self.client.close()
-        except (AttributeError, ServiceBusClient) as ex:
-            logger.warning(f'An error occurred while closing the client: {ex}')
+        for name, resource in resources:
+            try:
+                resource.close()
+            except (AttributeError, ServiceBusError) as ex:
+                logger.warning(f'An error occurred while closing the {name}: {ex}')
 
     def dlq_has_messages(self) -> bool:
         """
@@ -167,126 +690,1632 @@ class Extractor:
             A list of messages.
         """
         self.dlq_has_messages()
-        messages = self.receiver.receive_messages(
-            max_message_count=MAX_MESSAGES_IN_BATCH,
-            max_wait_time=WAIT_TIME_SECONDS
-        )
-
-        # The default lock is 30 seconds.  We extend that to be auto-renewed for
-        # 2 minutes.
-        for message in messages:
-            self.renewer.register(self.receiver, message, max_lock_renewal_duration=120)
+        messages = self.receive()
+        self.register_locks(messages)
 
         if len(messages) == 0:
             self.empty_receive_count += 1
             logger.debug(f'No messages received.  Empty count: {self.empty_receive_count}')
-            if self.empty_receive_count >= MAX_EMPTY_RECEIVES:
+            if self.empty_receive_count >= self.max_empty_receives:
                 self.finished = True
         else:
             self.empty_receive_count = 0
 
         return messages
 
+    def receive(self) -> list[ServiceBusMessage]:
+        """
+        Receive a batch of messages.
 
-class Loader:
-    """Load messages onto blob storage."""
+        Returns
+        -------
+        list[ServiceBusMessage]
+            The messages received.  For a session extractor, an empty list is
+            returned and the extractor is finished if no session could be
+            accepted within the wait time.
+        """
+        try:
+            return self.receiver.receive_messages(
+                max_message_count=THROTTLE.scaled(self.config.max_messages_in_batch),
+                max_wait_time=self.config.wait_time_seconds
+            )
+        except OperationTimeoutError:
+            if self.session_id is None:
+                raise
 
-    def __init__(self, connection_string: str, container_name: str, topics_dir: str, topic_name: str, path_format: str):
-        self.connection_string = connection_string
-        self.container_name = container_name
-        self.topics_dir = topics_dir
-        self.topic_name = topic_name
-        self.path_format = path_format
-        client = azure.storage.blob.BlobServiceClient.from_connection_string(self.connection_string)
-        self.transport_params = {
-            'client': client
-        }
-        self.path = None
+            logger.debug(f'No session available on {self.topic_name}/{self.subscription_name}.')
+            self.finished = True
+            self.no_session_available = True
+            return []
 
-    def load(self, messages: list[ServiceBusMessage]) -> None:
+    def register_locks(self, messages: list[ServiceBusMessage]) -> None:
         """
-        Load messages into blob storage.
+        Register the locks of received messages for auto-renewal.
+
+        The default lock is 30 seconds.  We extend that to be auto-renewed
+        for LOCK_RENEWAL_SECONDS (2 minutes) and record when the renewal
+        ends in lock_deadline.  Messages received from a session are locked
+        by the session, so the session lock is registered instead (once,
+        when the first messages are received from the session).
 
         Parameters
         ----------
         messages : list[ServiceBusMessage]
-            The messages to be loaded.
+            The messages that have just been received.
         """
-        if len(messages) == 0:
-            return
-
-        first_message_in_batch = messages[-1]
-        timestamp = first_message_in_batch.enqueued_time_utc
-        offset = first_message_in_batch.sequence_number
-        uri = LoadURI(
-            container_name=self.container_name,
-            topics_directory=self.topics_dir,
-            topic_name=self.topic_name,
-            path_format=self.path_format
-        )
-        uri = uri.uri(offset=offset, timestamp=timestamp)
-        self.path = uri
+        if self.session_id is None:
+            self.lock_deadline = time.monotonic() + LOCK_RENEWAL_SECONDS
 
-        with smart_open.open(uri, 'w', transport_params=self.transport_params) as stream:
             for message in messages:
-                body = str(message)
-                stream.write(body + '\n')
+                self.renewer.register(self.receiver, message, max_lock_renewal_duration=LOCK_RENEWAL_SECONDS)
+        elif messages and not self.is_session_lock_registered:
+            self.lock_deadline = time.monotonic() + LOCK_RENEWAL_SECONDS
+            self.renewer.register(self.receiver, self.receiver.session, max_lock_renewal_duration=LOCK_RENEWAL_SECONDS)
+            self.is_session_lock_registered = True
 
+    def session(self) -> str:
+        """
+        Get the ID of the session that has been accepted.
 
-def get_environment_variable(key_name: str, default=None, required=False) -> str:
-    """
-    Get and environment variable value.
+        Returns
+        -------
+        str
+            The session ID or None if this is not a session extractor.
+        """
+        if self.session_id is None:
+            return None
 
-    Parameters
-    ----------
-    key_name : str
-        The name of the environment variable.
-    default : str
-        The value to set if key_name is not set and required is false.
-    required : bool, optional
-        If set to true and the variable is not set, exit with error.
-        Default is false.
+        return self.receiver.session.session_id
 
-    Returns
-    -------
-    str
-        The value of the environment variable.
-    """
-    value = os.getenv(key_name)
 
-    if required and value is None:
-        logging.error(f'Missing required environment variable "{key_name}".')
-        sys.exit(2)
-    elif value is None and default is not None:
-        value = default
+class EnvelopeEncoder:
+    """
+    Encode messages as JSON lines with the body and all of the properties.
 
-    return value
+    Each line is a JSON object with the message body, the system
+    properties and the application properties.
+    Bodies that are not valid UTF-8 are base64 encoded and the
+    body_encoding field is set accordingly.  AMQP sequence and value bodies
+    are written as JSON with the body_type field set (see body).  Likewise, the encoding of any
+    bytes application property values is set in the
+    application_property_encodings field.  If orjson is installed, it is
+    used in preference to the standard library json module (the output is
+    the same).
+    """
 
+    def __init__(self):
+        if orjson is None:
+            self._json_encoder = json.JSONEncoder(separators=(',', ':'), default=self.default)
 
-def is_max_runtime_exceeded(start_time: float) -> bool:
-    """
-    Check if the runtime is set and if so, has it been exceeded.
+    def dumps(self, envelope: dict) -> bytes:
+        """
+        Serialise an envelope to JSON.
+
+        Parameters
+        ----------
+        envelope : dict
+            The envelope to be serialised.
+
+        Returns
+        -------
+        bytes
+            The envelope as UTF-8 encoded JSON.
+        """
+        if orjson is None:
+            return self._json_encoder.encode(envelope).encode()
+
+        return orjson.dumps(envelope, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+
+    @staticmethod
+    def default(value):
+        """
+        Convert values that are not natively JSON serialisable.
+
+        Parameters
+        ----------
+        value : any
+            The value to be converted.
+
+        Returns
+        -------
+        any
+            A JSON serialisable representation of the value.  UUIDs are
+            converted to strings (as orjson does natively) and decimals to
+            strings, so that no precision is lost.
+
+        Raises
+        ------
+        TypeError
+            If the value can not be converted.
+        """
+        if isinstance(value, (bytes, bytearray)):
+            return bytes_to_str(value)[0]
+        elif isinstance(value, datetime.datetime):
+            return value.isoformat()
+        elif isinstance(value, datetime.timedelta):
+            return value.total_seconds()
+        elif isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+    def encode(self, messages: list[ServiceBusMessage]) -> bytes:
+        """
+        Encode a batch of messages.
+
+        Parameters
+        ----------
+        messages : list[ServiceBusMessage]
+            The messages to be encoded.
+
+        Returns
+        -------
+        bytes
+            The messages as newline terminated JSON objects.
+        """
+        dumps = self.dumps
+        envelope = self.envelope
+        lines = [dumps(envelope(message)) for message in messages]
+        lines.append(b'')
+        return b'\n'.join(lines)
+
+    @staticmethod
+    def envelope(message: ServiceBusMessage) -> dict:
+        """
+        Create the envelope for a message.
+
+        The AMQP header and properties are read from the raw AMQP message
+        as the equivalent message properties are comparatively slow to
+        access.  Properties that are not set are omitted.
+
+        Parameters
+        ----------
+        message : ServiceBusMessage
+            The message to be enveloped.
+
+        Returns
+        -------
+        dict
+            The body and properties of the message.
+        """
+        raw_amqp_message = message.raw_amqp_message
+        response = EnvelopeEncoder.body(message)
+        copy_fields(raw_amqp_message.header, AMQP_HEADER_FIELDS, response)
+        copy_fields(raw_amqp_message.properties, AMQP_PROPERTY_FIELDS, response)
+        copy_fields(message, MESSAGE_FIELDS, response)
+        response['application_properties'], encodings = EnvelopeEncoder.application_properties(message)
+
+        if encodings:
+            response['application_property_encodings'] = encodings
+
+        return response
+
+    @staticmethod
+    def body(message: ServiceBusMessage) -> dict:
+        """
+        Get the body fields of the envelope for a message.
+
+        Data bodies are joined into bytes.  Sequence and value bodies are
+        converted to JSON values (see json_value) and the body_type field is
+        set to "sequence" or "value".  A body that is bytes is converted
+        with bytes_to_str and the body_encoding field is set.
+
+        Parameters
+        ----------
+        message : ServiceBusMessage
+            The message to get the body of.
+
+        Returns
+        -------
+        dict
+            The body, body_encoding (if the body is bytes) and body_type (if
+            the body is not data) fields.
+        """
+        body = message.body
+        body_type = message.body_type
+        response = {}
+
+        if body_type == AmqpMessageBodyType.DATA:
+            body = body if isinstance(body, bytes) else b''.join(body)
+        else:
+            response['body_type'] = body_type.value
+            body = EnvelopeEncoder.json_value(list(body) if body_type == AmqpMessageBodyType.SEQUENCE else body)
+
+        if isinstance(body, bytes):
+            body, response['body_encoding'] = bytes_to_str(body)
+
+        response['body'] = body
+        return response
+
+    @staticmethod
+    def json_key(key):
+        """
+        Convert a map key so that JSON can represent it.
+
+        Parameters
+        ----------
+        key : any
+            The AMQP map key.
+
+        Returns
+        -------
+        any
+            The key, with bytes converted by bytes_to_str.
+        """
+        return bytes_to_str(key)[0] if isinstance(key, bytes) else key
+
+    @staticmethod
+    def json_value(value):
+        """
+        Convert an AMQP value so that maps have keys that JSON can represent.
+
+        Received maps (e.g. in value and sequence bodies) have bytes keys,
+        which are decoded.  Any other values that are not natively JSON
+        serialisable are converted by default.
+
+        Parameters
+        ----------
+        value : any
+            The AMQP value.
+
+        Returns
+        -------
+        any
+            The value with any maps and lists converted recursively.
+        """
+        if isinstance(value, dict):
+            return {EnvelopeEncoder.json_key(key): EnvelopeEncoder.json_value(item) for key, item in value.items()}
+        elif isinstance(value, (list, tuple)):
+            return [EnvelopeEncoder.json_value(item) for item in value]
+
+        return value
+
+    @staticmethod
+    def application_properties(message: ServiceBusMessage) -> tuple[dict, dict]:
+        """
+        Get the application properties of a message with string keys.
+
+        Parameters
+        ----------
+        message : ServiceBusMessage
+            The message to get the application properties from.
+
+        Returns
+        -------
+        tuple[dict, dict]
+            The application properties and the encoding ("utf-8" or
+            "base64") of each value that was bytes.  Received messages have
+            bytes keys which are decoded.
+        """
+        properties = {}
+        encodings = {}
+
+        for key, value in (message.application_properties or {}).items():
+            key = key.decode() if isinstance(key, bytes) else key
+
+            if isinstance(value, bytes):
+                value, encodings[key] = bytes_to_str(value)
+
+            properties[key] = value
+
+        return properties, encodings
+
+
+class TextEncoder:
+    """Encode messages as their string representation, one per line."""
+
+    def encode(self, messages: list[ServiceBusMessage]) -> bytes:
+        """
+        Encode a batch of messages.
+
+        Parameters
+        ----------
+        messages : list[ServiceBusMessage]
+            The messages to be encoded.
+
+        Returns
+        -------
+        bytes
+            The messages as newline terminated strings.
+        """
+        lines = [str(message) for message in messages]
+        lines.append('')
+        return '\n'.join(lines).encode()
+
+
+ENCODERS = {
+    'envelope': EnvelopeEncoder,
+    'text': TextEncoder
+}
+
+
+class DuplicateFilter:
+    """
+    Remember the messages that have been archived within a window.
+
+    Subclasses define how messages are keyed and how the keys are stored.
+
+    Parameters
+    ----------
+    window : int
+        How many of the most recent keys to remember (see the subclasses).
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, message: ServiceBusMessage) -> bool:
+        """
+        Check if a message has already been archived.
+
+        Parameters
+        ----------
+        message : ServiceBusMessage
+            The message that has just been received.
+
+        Returns
+        -------
+        bool
+            True if the key of the message has been remembered.
+        """
+        return self.contains(self.key(message))
+
+    def remember(self, messages: list[ServiceBusMessage]) -> None:
+        """
+        Remember messages that have been archived.
+
+        Parameters
+        ----------
+        messages : list[ServiceBusMessage]
+            The messages that have just been loaded.
+        """
+        with self._lock:
+            for message in messages:
+                self.add(self.key(message))
+
+    def unseen(self, messages: list[ServiceBusMessage]) -> list[ServiceBusMessage]:
+        """
+        Remove the messages that have already been archived.
+
+        Parameters
+        ----------
+        messages : list[ServiceBusMessage]
+            The messages that have just been received.
+
+        Returns
+        -------
+        list[ServiceBusMessage]
+            The messages that have not been archived within the window.
+        """
+        with self._lock:
+            response = [message for message in messages if not self.is_duplicate(message)]
+
+        if len(response) < len(messages):
+            COUNTERS['duplicate_messages'].inc(len(messages) - len(response))
+
+        return response
+
+
+class MessageIdFilter(DuplicateFilter):
+    """
+    Remember the message IDs of archived messages with a rotating Bloom filter.
+
+    Two Bloom filters of window keys each are kept.  When the current one is
+    full, the older one is discarded and replaced with an empty one, so
+    between window and twice window of the most recent IDs are remembered.
+    Each filter has a false positive rate of FALSE_POSITIVE_RATE when full
+    and takes about 3.6 bytes per key.  So that a false positive can't drop
+    a new message, only redelivered messages (with a delivery count above
+    zero) are checked.  Messages without an ID are never treated as
+    duplicates.
+    """
+
+    FALSE_POSITIVE_RATE = 1e-6
+
+    def __init__(self, window: int):
+        super().__init__(window)
+        self.bit_count = math.ceil(-window * math.log(self.FALSE_POSITIVE_RATE) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.bit_count / window * math.log(2)))
+        self.filters = [bytearray((self.bit_count + 7) // 8), bytearray((self.bit_count + 7) // 8)]
+        self.key_count = 0
+
+    def add(self, key: str) -> None:
+        """Add a message ID to the current Bloom filter, rotating it first if full."""
+        if key is None:
+            return
+        elif self.key_count >= self.window:
+            self.filters = [self.filters[1], bytearray(len(self.filters[1]))]
+            self.key_count = 0
+
+        for position in self.positions(key):
+            self.filters[1][position >> 3] |= 1 << (position & 7)
+
+        self.key_count += 1
+
+    def is_duplicate(self, message: ServiceBusMessage) -> bool:
+        """Check if a redelivered message has an archived message ID."""
+        return bool(getattr(message, 'delivery_count', None)) and super().is_duplicate(message)
+
+    def contains(self, key: str) -> bool:
+        """Check if a message ID is in either Bloom filter."""
+        if key is None:
+            return False
+
+        positions = self.positions(key)
+        return any(all(bits[position >> 3] & (1 << (position & 7)) for position in positions) for bits in self.filters)
+
+    @staticmethod
+    def key(message: ServiceBusMessage) -> str:
+        """Get the message ID of a message."""
+        return message.message_id
+
+    def positions(self, key: str) -> list[int]:
+        """Get the bit positions of a key (double hashing of a 128-bit digest)."""
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.bit_count for i in range(self.hash_count)]
+
+
+class RangeSet:
+    """A set of integers stored as sorted, non-overlapping, inclusive ranges."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __contains__(self, number: int) -> bool:
+        """Check if a number is in the set."""
+        index = bisect.bisect_right(self.starts, number) - 1
+        return index >= 0 and number <= self.ends[index]
+
+    def add(self, number: int) -> None:
+        """Add a number, extending or merging the neighbouring ranges."""
+        index = bisect.bisect_right(self.starts, number)
+
+        if index and number <= self.ends[index - 1] + 1:
+            self.ends[index - 1] = max(self.ends[index - 1], number)
+            index -= 1
+        else:
+            self.starts.insert(index, number)
+            self.ends.insert(index, number)
+
+        if index + 1 < len(self.starts) and self.starts[index + 1] == self.ends[index] + 1:
+            self.ends[index] = self.ends.pop(index + 1)
+            del self.starts[index + 1]
+
+    def discard_below(self, number: int) -> None:
+        """Discard the numbers below a number."""
+        index = bisect.bisect_left(self.ends, number)
+        del self.starts[:index]
+        del self.ends[:index]
+
+        if self.starts and self.starts[0] < number:
+            self.starts[0] = number
+
+
+class SequenceNumberFilter(DuplicateFilter):
+    """
+    Remember the sequence numbers of archived messages as ranges.
+
+    As the messages of a batch usually have consecutive sequence numbers,
+    only a few ranges are stored.  The sequence numbers more than window
+    below the highest archived sequence number are forgotten.  The
+    partitions of a partitioned entity (the top 16 bits of the sequence
+    number) are tracked separately.
+    """
+
+    PARTITION_SHIFT = 48
+
+    def __init__(self, window: int):
+        super().__init__(window)
+        self.partitions = collections.defaultdict(RangeSet)
+
+    def add(self, key: int) -> None:
+        """Add a sequence number, forgetting those that are now outside the window."""
+        ranges = self.partitions[key >> self.PARTITION_SHIFT]
+        ranges.add(key)
+        ranges.discard_below(ranges.ends[-1] - self.window + 1)
+
+    def contains(self, key: int) -> bool:
+        """Check if a sequence number has been archived."""
+        return key in self.partitions.get(key >> self.PARTITION_SHIFT, ())
+
+    @staticmethod
+    def key(message: ServiceBusMessage) -> int:
+        """Get the sequence number of a message."""
+        return message.sequence_number
+
+
+DUPLICATE_FILTERS = {
+    'message_id': MessageIdFilter,
+    'sequence_number': SequenceNumberFilter
+}
+
+
+class Loader:
+    """
+    Load messages onto blob storage.
+
+    Parameters
+    ----------
+    connection_string : str
+        The connection string for the storage account.
+    config : TopicConfig
+        The configuration of the topic the messages were extracted from.
+    dead_letter : bool, optional
+        Load dead-lettered messages.  They are written to the "deadletter"
+        directory of the topic in the envelope format, so that the
+        dead-letter reason and description are kept.  By default False.
+    """
+
+    def __init__(self, connection_string: str, config: 'TopicConfig', dead_letter: bool = False):
+        self.connection_string = connection_string
+        self.config = config
+        self.encoder = ENCODERS['envelope' if dead_letter else config.output_format]()
+        self.load_uri = config.load_uri(dead_letter)
+        self.duplicate_filter = duplicate_filter(config, dead_letter)
+        self.path = None
+        self._transport_params = None
+        self._transport_params_lock = threading.Lock()
+        prewarm_imports(*STORAGE_MODULES)
+
+    @property
+    def transport_params(self) -> dict:
+        """
+        Get the smart_open transport parameters.
+
+        The blob service client is created on first use.
+
+        Returns
+        -------
+        dict
+            The transport parameters, including the blob service client.
+        """
+        with self._transport_params_lock:
+            if self._transport_params is None:
+                blob = lazy_import('azure.storage.blob')
+                client = blob.BlobServiceClient.from_connection_string(self.connection_string)
+                self._transport_params = {
+                    'client': client
+                }
+
+        return self._transport_params
+
+    def load(self, messages: list[ServiceBusMessage], session_id: str = None) -> None:
+        """
+        Load messages into blob storage.
+
+        Parameters
+        ----------
+        messages : list[ServiceBusMessage]
+            The messages to be loaded.
+        session_id : str, optional
+            The session that the messages were received from.
+        """
+        if len(messages) == 0:
+            return
+
+        first_message_in_batch = messages[-1]
+        timestamp = first_message_in_batch.enqueued_time_utc
+        offset = first_message_in_batch.sequence_number
+        uri = self.load_uri.uri(offset=offset, timestamp=timestamp, session_id=session_id)
+        self.path = uri
+
+        data = self.encoder.encode(messages)
+
+        with lazy_import('smart_open').open(uri, 'wb', transport_params=self.transport_params) as stream:
+            stream.write(data)
+
+
+class TopicConfig:
+    """
+    The configuration for archiving a topic/subscription.
+
+    Any setting that is not provided is taken from the environment
+    variables (see the README), so that a deployment can set its defaults
+    there and override them for individual topics in a configuration file
+    (see topic_configs).
+
+    Parameters
+    ----------
+    topic_name : str
+        The name of the topic to extract from.
+    subscription_name : str
+        The name of the subscription to use to extract from the topic.
+    **settings
+        Overrides for any of the settings in TopicConfig.SETTINGS.
+
+    Raises
+    ------
+    ValueError
+        If a setting is unknown, is of the wrong type or is out of range.
+    """
+
+    SETTINGS = {
+        'archive_dead_letters': bool,
+        'check_for_dead_letter_messages': bool,
+        'codec': str,
+        'container_name': str,
+        'duplicate_filter': str,
+        'duplicate_window': int,
+        'max_concurrent_sessions': int,
+        'max_empty_receives': int,
+        'max_messages_in_batch': int,
+        'max_runtime_seconds': int,
+        'output_format': str,
+        'path_format': str,
+        'requires_session': bool,
+        'topics_dir': str,
+        'wait_time_seconds': int
+    }
+
+    CHOICES = {
+        'codec': tuple(CODECS),
+        'duplicate_filter': ('none', *DUPLICATE_FILTERS),
+        'output_format': tuple(ENCODERS)
+    }
+
+    MINIMUMS = {
+        'duplicate_window': 1,
+        'max_concurrent_sessions': 1,
+        'max_empty_receives': 1,
+        'max_messages_in_batch': 1,
+        'max_runtime_seconds': 0,
+        'wait_time_seconds': 1
+    }
+
+    def __init__(self, topic_name: str, subscription_name: str, **settings):
+        unknown_settings = sorted(set(settings) - set(self.SETTINGS))
+
+        if unknown_settings:
+            raise ValueError(f'Unknown settings for {topic_name}: {", ".join(unknown_settings)}.')
+
+        self.topic_name = topic_name
+        self.subscription_name = subscription_name
+        defaults = self.defaults()
+
+        for name, setting_type in self.SETTINGS.items():
+            value = settings.get(name, defaults[name])
+
+            if not self._is_type(value, setting_type):
+                raise ValueError(f'The {name} setting for {topic_name} must be a {setting_type.__name__}.')
+
+            setattr(self, name, value)
+
+        self.validate()
+
+    def __repr__(self) -> str:
+        """Represent the configuration for logging."""
+        settings = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.SETTINGS)
+        return f'TopicConfig({self.topic_name!r}, {self.subscription_name!r}, {settings})'
+
+    @staticmethod
+    def defaults() -> dict:
+        """
+        Get the default settings from the environment variables.
+
+        Returns
+        -------
+        dict
+            The default value of each setting.
+        """
+        return {
+            'archive_dead_letters': get_environment_variable('ARCHIVE_DEAD_LETTERS', default='0') == '1',
+            'check_for_dead_letter_messages': get_environment_variable('CHECK_FOR_DL_MESSAGES', default='0') == '1',
+            'codec': get_environment_variable('CODEC', default='gzip'),
+            'container_name': get_environment_variable('CONTAINER_NAME', default=''),
+            'duplicate_filter': get_environment_variable('DUPLICATE_FILTER', default='none'),
+            'duplicate_window': DUPLICATE_WINDOW,
+            'max_concurrent_sessions': MAX_CONCURRENT_SESSIONS,
+            'max_empty_receives': MAX_EMPTY_RECEIVES,
+            'max_messages_in_batch': MAX_MESSAGES_IN_BATCH,
+            'max_runtime_seconds': MAX_RUNTIME_SECONDS,
+            'output_format': get_environment_variable('OUTPUT_FORMAT', default='text'),
+            'path_format': get_environment_variable('PATH_FORMAT', default=''),
+            'requires_session': get_environment_variable('REQUIRES_SESSION', default='0') == '1',
+            'topics_dir': get_environment_variable('TOPICS_DIR', default='topics'),
+            'wait_time_seconds': WAIT_TIME_SECONDS
+        }
+
+    @classmethod
+    def from_environment(cls) -> 'TopicConfig':
+        """
+        Create the configuration of a single topic from the environment variables.
+
+        Returns
+        -------
+        TopicConfig
+            The configuration for TOPIC_NAME and SUBSCRIPTION_NAME.
+        """
+        return cls(
+            get_environment_variable('TOPIC_NAME', required=True),
+            get_environment_variable('SUBSCRIPTION_NAME', required=True)
+        )
+
+    @classmethod
+    def from_config_file(cls, topic_name: str, subscription_name: str, config_file: dict) -> 'TopicConfig':
+        """
+        Create the configuration of a topic with the overrides from a configuration file.
+
+        The settings for "topic:subscription" take precedence over those for
+        the topic, which take precedence over the defaults in the file.
+
+        Parameters
+        ----------
+        topic_name : str
+            The name of the topic to extract from.
+        subscription_name : str
+            The name of the subscription to use to extract from the topic.
+        config_file : dict
+            The contents of the configuration file (see read_config_file).
+
+        Returns
+        -------
+        TopicConfig
+            The configuration for the topic/subscription.
+        """
+        topics = config_file.get('topics', {})
+        settings = {
+            **config_file.get('defaults', {}),
+            **topics.get(topic_name, {}),
+            **topics.get(f'{topic_name}:{subscription_name}', {})
+        }
+        return cls(topic_name, subscription_name, **settings)
+
+    def load_uri(self, dead_letter: bool = False) -> LoadURI:
+        """
+        Get the load URI for the topic.
+
+        Parameters
+        ----------
+        dead_letter : bool, optional
+            Get the load URI for the dead-lettered messages of the topic,
+            by default False.
+
+        Returns
+        -------
+        LoadURI
+            The load URI for the container, topics directory, path format and codec.
+        """
+        sub_directory = 'deadletter' if dead_letter else ''
+        return LoadURI(
+            self.container_name,
+            self.topics_dir,
+            self.topic_name,
+            self.path_format,
+            sub_directory,
+            self.codec
+        )
+
+    def validate(self) -> None:
+        """
+        Validate the ranges of the settings.
+
+        Raises
+        ------
+        ValueError
+            If a setting is out of range.
+        """
+        if not self.container_name:
+            raise ValueError(f'The container_name setting (or CONTAINER_NAME) is required for {self.topic_name}.')
+
+        self._validate_choices()
+
+        for name, minimum in self.MINIMUMS.items():
+            if getattr(self, name) < minimum:
+                raise ValueError(f'The {name} setting for {self.topic_name} must be at least {minimum}.')
+
+    @staticmethod
+    def _is_type(value, setting_type: type) -> bool:
+        # bool is a subclass of int, but true is not a valid batch size.
+        return isinstance(value, setting_type) and (setting_type is bool or not isinstance(value, bool))
+
+    def _validate_choices(self) -> None:
+        for name, choices in self.CHOICES.items():
+            if getattr(self, name) not in choices:
+                raise ValueError(f'The {name} for {self.topic_name} must be one of {", ".join(choices)}.')
+
+
+class BacklogMonitor:
+    """
+    Poll the message counts of subscriptions in the background.
+
+    The counts are cached between polls so that they can be read as often
+    as required (e.g. on every Prometheus scrape) without calling the Service
+    Bus administration API each time.
+
+    Parameters
+    ----------
+    connection_string : str
+        The connection string for the Service Bus namespace.
+    topics_and_subscriptions : list[tuple]
+        The topic and subscription names to be polled.
+    interval_seconds : float, optional
+        How often to poll, by default BACKLOG_POLL_SECONDS.
+    """
+
+    def __init__(self, connection_string: str, topics_and_subscriptions: list[tuple],
+                 interval_seconds: float = BACKLOG_POLL_SECONDS):
+        self.connection_string = connection_string
+        self.topics_and_subscriptions = topics_and_subscriptions
+        self.interval_seconds = interval_seconds
+        self.counts = {}
+        self._stop = threading.Event()
+
+    def message_count(self, topic_name: str, subscription_name: str, kind: str) -> float:
+        """
+        Get the cached message count of a subscription.
+
+        Parameters
+        ----------
+        topic_name : str
+            The name of the topic.
+        subscription_name : str
+            The name of the subscription.
+        kind : str
+            Either "active" or "dead_letter".
+
+        Returns
+        -------
+        float
+            The message count from the last successful poll or NaN if the
+            subscription has not been polled successfully.
+        """
+        return float(self.counts.get((topic_name, subscription_name), {}).get(kind, 'nan'))
+
+    def poll(self, client) -> bool:
+        """
+        Poll the runtime properties of each subscription.
+
+        Parameters
+        ----------
+        client : ServiceBusAdministrationClient
+            The client to get the runtime properties with.
+
+        Returns
+        -------
+        bool
+            True if every subscription was polled successfully.
+        """
+        success = True
+
+        for topic_name, subscription_name in self.topics_and_subscriptions:
+            try:
+                properties = client.get_subscription_runtime_properties(topic_name, subscription_name)
+            except AzureError as ex:
+                logger.warning(f'{topic_name} - Unable to get the message counts of {subscription_name}: {ex}')
+                success = False
+                continue
+
+            self.counts[(topic_name, subscription_name)] = {
+                'active': properties.active_message_count,
+                'dead_letter': properties.dead_letter_message_count
+            }
+
+        return success
+
+    def poll_until_stopped(self) -> None:
+        """
+        Connect and poll at the interval until stopped.
+
+        Raises
+        ------
+        ValueError
+            If the connection string is not set.
+        """
+        if not self.connection_string:
+            raise ValueError('SERVICE_BUS_CONNECTION_STRING is not set.')
+
+        module = lazy_import('azure.servicebus.management')
+
+        with module.ServiceBusAdministrationClient.from_connection_string(self.connection_string) as client:
+            while not self._stop.is_set():
+                self.poll(client)
+                self._stop.wait(self.interval_seconds)
+
+    def run(self) -> None:
+        """
+        Poll at the interval until stopped.
+
+        Any error that stops polling (e.g. the client can not be created) is
+        logged and polling is retried, with a new client, after the interval.
+        """
+        while not self._stop.is_set():
+            try:
+                self.poll_until_stopped()
+            except Exception as ex:
+                logger.warning(f'Unable to poll the message counts: {ex}')
+                self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        """Start polling in a background thread unless the interval is zero."""
+        if self.interval_seconds > 0 and self.topics_and_subscriptions:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop polling."""
+        self._stop.set()
+
+
+def get_environment_variable(key_name: str, default=None, required=False) -> str:
+    """
+    Get and environment variable value.
+
+    Parameters
+    ----------
+    key_name : str
+        The name of the environment variable.
+    default : str
+        The value to set if key_name is not set and required is false.
+    required : bool, optional
+        If set to true and the variable is not set, exit with error.
+        Default is false.
+
+    Returns
+    -------
+    str
+        The value of the environment variable.
+    """
+    value = os.getenv(key_name)
+
+    if required and value is None:
+        logging.error(f'Missing required environment variable "{key_name}".')
+        sys.exit(2)
+    elif value is None and default is not None:
+        value = default
+
+    return value
+
+
+def bytes_to_str(data: bytes) -> tuple[str, str]:
+    """
+    Convert bytes to a string, falling back to base64 for binary data.
+
+    Parameters
+    ----------
+    data : bytes
+        The data to be converted.
+
+    Returns
+    -------
+    tuple[str, str]
+        The string and the encoding that was used ("utf-8" or "base64").
+    """
+    try:
+        return data.decode(), 'utf-8'
+    except UnicodeDecodeError:
+        return base64.b64encode(data).decode('ascii'), 'base64'
+
+
+def copy_fields(source: object, fields: tuple, target: dict) -> None:
+    """
+    Copy the attributes of an object that are set into a dictionary.
+
+    Parameters
+    ----------
+    source : object
+        The object to copy the attributes from.  May be None.
+    fields : tuple
+        Pairs of the attribute name and the key to copy the value to.
+    target : dict
+        The dictionary to copy the values into.
+    """
+    if source is None:
+        return
+
+    for attribute, key in fields:
+        value = getattr(source, attribute, None)
+
+        if value is not None:
+            target[key] = value
+
+
+def drain(extractor: Extractor, loader: Loader, start_time: float, shutdown: Shutdown) -> int:
+    """
+    Extract messages and load them until the extractor is finished.
+
+    Parameters
+    ----------
+    extractor : Extractor
+        The extractor to receive the messages from.  It is closed on return.
+    loader : Loader
+        The loader to write the messages with.
+    start_time : float
+        The time that the process started at.
+    shutdown : Shutdown
+        Stop receiving messages when a shutdown is requested.
+
+    Returns
+    -------
+    int
+        The number of messages loaded.
+    """
+    message_count = 0
+
+    try:
+        while not (extractor.finished or shutdown.is_requested()):
+            try:
+                if is_max_runtime_exceeded(start_time, extractor.config.max_runtime_seconds):
+                    logger.warning(
+                        f'Max runtime of {extractor.config.max_runtime_seconds} seconds exceeded for '
+                        f'{extractor.topic_name}.  Breaking early.'
+                    )
+                    break
+
+                message_count += drain_batch(extractor, loader, shutdown)
+                THROTTLE.success()
+            except AzureError as ex:
+                logger.warning(f'{extractor.topic_name} - {ex}')
+                THROTTLE.backoff(ex, shutdown)
+    finally:
+        # Closing the receiver releases any prefetched (and unsettled) messages without adding to their
+        # delivery count.
+        extractor.close()
+
+    return message_count
+
+
+def drain_batch(extractor: Extractor, loader: Loader, shutdown: Shutdown) -> int:
+    """
+    Extract a batch of messages and load them.
+
+    Parameters
+    ----------
+    extractor : Extractor
+        The extractor to receive the messages from.
+    loader : Loader
+        The loader to write the messages with.
+    shutdown : Shutdown
+        If the upload has not completed by the shutdown deadline, the
+        messages are abandoned.
+
+    Returns
+    -------
+    int
+        The number of messages loaded.
+
+    Raises
+    ------
+    AzureError
+        If the messages could not be received or loaded (see
+        load_with_retries).  Messages that could not be loaded are abandoned
+        first.
+    """
+    messages = extractor.get_messages()
+    new_messages = loader.duplicate_filter.unseen(messages) if loader.duplicate_filter else messages
+
+    try:
+        is_loaded = load_with_retries(loader, new_messages, extractor.session(), shutdown, extractor.lock_deadline)
+    except AzureError:
+        extractor.abandon_messages(messages)
+        raise
+
+    if not is_loaded:
+        extractor.abandon_messages(messages)
+        return 0
+
+    if loader.duplicate_filter:
+        loader.duplicate_filter.remember(new_messages)
+
+    extractor.accept_messages(messages)
+    record_first_message(new_messages)
+    return len(new_messages)
+
+
+def drain_sessions(max_concurrent_sessions: int, connection_factory, extractor_factory, loader: Loader,
+                   start_time: float, shutdown: Shutdown) -> int:
+    """
+    Drain the sessions of a session-enabled subscription concurrently.
+
+    Each worker opens a connection, accepts the next available session on
+    it, drains it and then accepts another on the same connection until no
+    session is available or the maximum runtime is exceeded.  While Service Bus or storage is throttling, the workers
+    beyond the throttled concurrency (see Throttle) wait until it has
+    recovered before accepting sessions.
+
+    Parameters
+    ----------
+    max_concurrent_sessions : int
+        The maximum number of sessions to drain at once.
+    connection_factory : callable
+        Returns a new ServiceBusClient and AutoLockRenewer for a worker.
+    extractor_factory : callable
+        Called with a worker's client and renewer, returns a new Extractor
+        that accepts the next available session.
+    loader : Loader
+        The loader to write the messages with.
+    start_time : float
+        The time that the process started at.
+    shutdown : Shutdown
+        Stop accepting sessions when a shutdown is requested.
+
+    Returns
+    -------
+    int
+        The number of messages loaded.
+    """
+    no_more_sessions = threading.Event()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_sessions) as executor:
+        futures = [
+            executor.submit(
+                drain_session_worker, index, connection_factory, extractor_factory, loader, start_time, shutdown,
+                no_more_sessions
+            )
+            for index in range(max_concurrent_sessions)
+        ]
+        return sum(future.result() for future in futures)
+
+
+def drain_session_worker(index: int, connection_factory, extractor_factory, loader: Loader, start_time: float,
+                         shutdown: Shutdown, no_more_sessions: threading.Event) -> int:
+    """
+    Drain sessions one after another until no session is available.
+
+    The sessions are received over a single client and their locks are
+    renewed by a single renewer, which are closed when the worker stops.
+
+    Parameters
+    ----------
+    index : int
+        The index of the worker.  While the index is beyond the throttled
+        number of concurrent sessions, the worker waits instead of
+        accepting sessions.
+    connection_factory : callable
+        Returns a new ServiceBusClient and AutoLockRenewer.
+    extractor_factory : callable
+        Called with the client and renewer, returns a new Extractor that
+        accepts the next available session.
+    loader : Loader
+        The loader to write the messages with.
+    start_time : float
+        The time that the process started at.
+    shutdown : Shutdown
+        Stop accepting sessions when a shutdown is requested.
+    no_more_sessions : threading.Event
+        Shared by the workers.  Set by the first worker to find no session
+        available, so that the other workers stop (including any that are
+        waiting).
+
+    Returns
+    -------
+    int
+        The number of messages loaded.
+    """
+    message_count = 0
+    client, renewer = connection_factory()
+
+    with client, renewer:
+        while is_accepting_sessions(start_time, loader, shutdown, no_more_sessions):
+            if index >= THROTTLE.scaled(loader.config.max_concurrent_sessions):
+                no_more_sessions.wait(1)
+                continue
+
+            extractor = extractor_factory(client, renewer)
+            message_count += drain(extractor, loader, start_time, shutdown)
+
+            if extractor.no_session_available:
+                no_more_sessions.set()
+                break
+
+            logger.debug(f'Released session {extractor.session()} on {extractor.topic_name}.')
+
+    return message_count
+
+
+def duplicate_filter(config: TopicConfig, dead_letter: bool = False) -> DuplicateFilter:
+    """
+    Get the duplicate filter of a topic/subscription.
+
+    The filter is kept for the life of the process, so that messages that
+    are redelivered in a later run are still filtered.
+
+    Parameters
+    ----------
+    config : TopicConfig
+        The configuration of the topic/subscription.
+    dead_letter : bool, optional
+        Get the filter for the dead-letter sub-queue, by default False.
+
+    Returns
+    -------
+    DuplicateFilter
+        The filter or None if duplicate_filter is set to "none".
+    """
+    if config.duplicate_filter == 'none':
+        return None
+
+    key = (config.topic_name, config.subscription_name, dead_letter, config.duplicate_filter, config.duplicate_window)
+
+    with _duplicate_filters_lock:
+        if key not in _duplicate_filters:
+            _duplicate_filters[key] = DUPLICATE_FILTERS[config.duplicate_filter](config.duplicate_window)
+
+    return _duplicate_filters[key]
+
+
+def is_accepting_sessions(start_time: float, loader: Loader, shutdown: Shutdown,
+                          no_more_sessions: threading.Event) -> bool:
+    """
+    Check if a session worker should accept another session.
+
+    Parameters
+    ----------
+    start_time : float
+        The time that the process started at.
+    loader : Loader
+        The loader whose configuration has the maximum runtime.
+    shutdown : Shutdown
+        No sessions are accepted once a shutdown has been requested.
+    no_more_sessions : threading.Event
+        Set once a worker has found no session available.
+
+    Returns
+    -------
+    bool
+        True if another session should be accepted.
+    """
+    return not (
+        is_max_runtime_exceeded(start_time, loader.config.max_runtime_seconds)
+        or shutdown.is_requested()
+        or no_more_sessions.is_set()
+    )
+
+
+def prewarm_imports(*names: str) -> None:
+    """
+    Import modules in a background thread if they have not been imported.
+
+    This allows the imports to overlap with connecting to Service Bus and
+    waiting for the first batch of messages.
+
+    Parameters
+    ----------
+    *names : str
+        The names of the modules to import.
+    """
+    names = [name for name in names if name not in sys.modules]
+
+    def target():
+        for name in names:
+            lazy_import(name)
+
+    if names:
+        threading.Thread(target=target, daemon=True).start()
+
+
+def process_uptime() -> float:
+    """
+    Get the number of seconds since the process started.
+
+    Returns
+    -------
+    float
+        The uptime of the process, read from /proc.  If that is not
+        available, the time since this module was imported is returned.
+    """
+    try:
+        with open('/proc/self/stat') as stream:
+            start_ticks = int(stream.read().rsplit(')', 1)[1].split()[19])
+
+        with open('/proc/uptime') as stream:
+            system_uptime = float(stream.read().split()[0])
+
+        return system_uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED_AT
+
+
+def record_first_message(messages: list[ServiceBusMessage]) -> None:
+    """
+    Record the time to the first archived message of the process.
+
+    Parameters
+    ----------
+    messages : list[ServiceBusMessage]
+        The messages that have just been archived.
+    """
+    global _first_message_seconds
+
+    if _first_message_seconds is None and messages:
+        _first_message_seconds = process_uptime()
+        logger.info(
+            f'The first message was archived {_first_message_seconds:.3f} seconds after start up '
+            f'({import_seconds():.3f} seconds importing blob storage modules).'
+        )
+
+
+def floor_timestamp(timestamp: datetime.datetime, unit: str) -> datetime.datetime:
+    """
+    Truncate a timestamp to the start of a time unit.
+
+    Parameters
+    ----------
+    timestamp : datetime.datetime
+        The timestamp to be truncated.
+    unit : str
+        One of "year", "month", "day", "hour" or "minute".
+
+    Returns
+    -------
+    datetime.datetime
+        The truncated timestamp (without any timezone information).
+    """
+    fields = ['year', 'month', 'day', 'hour', 'minute']
+    values = [getattr(timestamp, field) for field in fields[:fields.index(unit) + 1]]
+    defaults = [1, 1, 1, 0, 0][len(values):]
+    return datetime.datetime(*values, *defaults)
+
+
+def lazy_import(name: str):
+    """
+    Import a module on first use, recording the time taken.
+
+    The module is always imported with importlib, even if it is already in
+    sys.modules, as that waits for an import that is in progress on
+    another thread (e.g. prewarm_imports) to complete.
+
+    Parameters
+    ----------
+    name : str
+        The name of the module.
+
+    Returns
+    -------
+    module
+        The imported module.
+    """
+    start_time = time.monotonic()
+    module = importlib.import_module(name)
+    elapsed_seconds = time.monotonic() - start_time
+
+    with _import_lock:
+        if elapsed_seconds > _import_seconds.get(name, 0.0):
+            _import_seconds[name] = elapsed_seconds
+            logger.debug(f'Imported {name} in {elapsed_seconds:.3f} seconds.')
+
+    return module
+
+
+def load_before_deadline(loader: Loader, messages: list[ServiceBusMessage], session_id: str,
+                         shutdown: Shutdown) -> bool:
+    """
+    Load messages, giving up if a shutdown deadline passes first.
+
+    The upload runs in a daemon thread so that an upload that is given up
+    on does not prevent the process from exiting.
+
+    Parameters
+    ----------
+    loader : Loader
+        The loader to write the messages with.
+    messages : list[ServiceBusMessage]
+        The messages to be loaded.
+    session_id : str
+        The session that the messages were received from (or None).
+    shutdown : Shutdown
+        The shutdown whose deadline limits the time for the upload.
+
+    Returns
+    -------
+    bool
+        True if the messages were loaded, False if the deadline passed.
+    """
+    errors = []
+
+    def target():
+        try:
+            loader.load(messages, session_id)
+        except Exception as ex:
+            errors.append(ex)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+
+    while thread.is_alive() and not shutdown.is_requested():
+        thread.join(1)
+
+    thread.join(shutdown.remaining())
+
+    if errors:
+        raise errors[0]
+
+    return not thread.is_alive()
+
+
+def load_with_retries(loader: Loader, messages: list[ServiceBusMessage], session_id: str, shutdown: Shutdown,
+                      lock_deadline: float) -> bool:
+    """
+    Load messages, backing off and retrying transient errors while they are locked.
+
+    Retrying the held messages, rather than abandoning them to be received
+    again, does not add to their delivery count, so an outage of storage
+    does not dead-letter them.
+
+    Parameters
+    ----------
+    loader : Loader
+        The loader to write the messages with.
+    messages : list[ServiceBusMessage]
+        The messages to be loaded.
+    session_id : str
+        The session that the messages were received from (or None).
+    shutdown : Shutdown
+        The shutdown whose deadline limits the time for the upload.
+    lock_deadline : float
+        The monotonic time that the locks of the messages stop being
+        renewed (see Extractor.register_locks).
+
+    Returns
+    -------
+    bool
+        True if the messages were loaded, False if the shutdown deadline
+        passed.
+
+    Raises
+    ------
+    AzureError
+        If an error is not transient (see Throttle.is_transient), or the
+        locks would stop being renewed or a shutdown has been requested
+        before the upload could be retried.
+    """
+    while True:
+        try:
+            return load_before_deadline(loader, messages, session_id, shutdown)
+        except AzureError as ex:
+            if not is_retryable(ex, shutdown, lock_deadline):
+                raise
+
+            logger.warning(f'Retrying the upload of {len(messages):,} messages after an error: {ex}')
+            THROTTLE.backoff(ex, shutdown)
+
+
+def is_retryable(error: Exception, shutdown: Shutdown, lock_deadline: float) -> bool:
+    """
+    Check if a failed upload can be retried while the messages are still locked.
+
+    Parameters
+    ----------
+    error : Exception
+        The error from the upload.
+    shutdown : Shutdown
+        No retries are made once a shutdown has been requested.
+    lock_deadline : float
+        The monotonic time that the locks stop being renewed.  There must be
+        time for the longest backoff before then.
+
+    Returns
+    -------
+    bool
+        True if the upload should be retried.
+    """
+    return (
+        Throttle.is_transient(error)
+        and not shutdown.is_requested()
+        and time.monotonic() + THROTTLE.max_seconds < (lock_deadline or 0)
+    )
+
+
+def next_timestamp(timestamp: datetime.datetime, unit: str) -> datetime.datetime:
+    """
+    Get the start of the time unit following the one a timestamp is in.
+
+    Parameters
+    ----------
+    timestamp : datetime.datetime
+        A timestamp that has been truncated by floor_timestamp.
+    unit : str
+        One of "year", "month", "day", "hour" or "minute".
+
+    Returns
+    -------
+    datetime.datetime
+        The start of the next time unit.
+    """
+    if unit == 'year':
+        return timestamp.replace(year=timestamp.year + 1)
+    elif unit == 'month':
+        return timestamp.replace(year=timestamp.year + timestamp.month // 12, month=timestamp.month % 12 + 1)
+
+    return timestamp + datetime.timedelta(**{f'{unit}s': 1})
+
+
+def time_buckets(start: datetime.datetime, end: datetime.datetime, unit: str, limit: int) -> list:
+    """
+    Get the start of each time unit between two timestamps.
+
+    Parameters
+    ----------
+    start : datetime.datetime
+        The start of the time range.
+    end : datetime.datetime
+        The end of the time range (inclusive).
+    unit : str
+        One of "year", "month", "day", "hour" or "minute".
+    limit : int
+        The maximum number of buckets to be returned.
+
+    Returns
+    -------
+    list
+        A list of datetime.datetime objects or None if there would be more
+        than limit buckets.
+    """
+    response = []
+    timestamp = floor_timestamp(start, unit)
+    end = end.replace(tzinfo=None)
+
+    while timestamp <= end:
+        if len(response) >= limit:
+            return None
+
+        response.append(timestamp)
+        timestamp = next_timestamp(timestamp, unit)
+
+    return response
+
+
+def first_message_seconds() -> float:
+    """
+    Get the time from the start of the process to the first archived message.
+
+    Returns
+    -------
+    float
+        The number of seconds or NaN if no message has been archived yet.
+    """
+    return float('nan') if _first_message_seconds is None else _first_message_seconds
+
+
+def import_seconds() -> float:
+    """
+    Get the time spent importing the modules that are imported lazily.
+
+    Returns
+    -------
+    float
+        The number of seconds spent in lazy_import (the longest import of
+        each module, so that time spent waiting for an import on another
+        thread is not counted twice).
+    """
+    return sum(_import_seconds.values())
+
+
+def is_max_runtime_exceeded(start_time: float, max_runtime_seconds: int = MAX_RUNTIME_SECONDS) -> bool:
+    """
+    Check if the runtime is set and if so, has it been exceeded.
 
     Parameters
     ----------
     start_time : float
         The time that the process started at.
+    max_runtime_seconds : int, optional
+        The maximum runtime, by default MAX_RUNTIME_SECONDS.
 
     Returns
     -------
     bool
-        False if MAX_RUNTIME_SECONDS is set to zero or the process is still
+        False if max_runtime_seconds is set to zero or the process is still
         within the max allowed time.  True if the time has been exceeded.
     """
-    if MAX_RUNTIME_SECONDS == 0:
+    if max_runtime_seconds == 0:
         return False
 
     process_time = time.monotonic() - start_time
-    return process_time >= MAX_RUNTIME_SECONDS
+    return process_time >= max_runtime_seconds
+
 
+def main(timer) -> None:
+    """
+    Control the main processing.
 
-def main(timer: func.TimerRequest) -> None:
-    """Control the main processing."""
+    Parameters
+    ----------
+    timer : azure.functions.TimerRequest
+        The timer that triggered the function.  It is deliberately not
+        annotated so that azure.functions does not have to be imported.
+    """
     global _message_count
     log_level = os.getenv('LOG_LEVEL', 'WARN')
     logger.setLevel(log_level)
@@ -295,51 +2324,106 @@ def main(timer: func.TimerRequest) -> None:
     if timer.past_due:
         logger.warning('The timer is past due!')
 
-    container_name = get_environment_variable('CONTAINER_NAME', required=True)
-    path_format = get_environment_variable('PATH_FORMAT', default='')
+    config = getattr(timer, 'config', None) or TopicConfig.from_environment()
+    shutdown = getattr(timer, 'shutdown', None) or Shutdown()
+    _message_count = archive(config, shutdown)
+
+
+def archive(config: TopicConfig, shutdown: Shutdown) -> int:
+    """
+    Archive the messages of a topic/subscription to blob storage.
+
+    Parameters
+    ----------
+    config : TopicConfig
+        The configuration of the topic/subscription to archive.
+    shutdown : Shutdown
+        A shutdown that may be requested while the topic is being archived.
+
+    Returns
+    -------
+    int
+        The number of messages loaded to blob storage.
+    """
     sa_connection_string = get_environment_variable('STORAGE_ACCOUNT_CONNECTION_STRING', required=True)
     sbns_connection_string = get_environment_variable('SERVICE_BUS_CONNECTION_STRING', required=True)
-    subscription_name = get_environment_variable('SUBSCRIPTION_NAME', required=True)
-    topics_dir = get_environment_variable('TOPICS_DIR', default='topics')
-    topic_name = get_environment_variable('TOPIC_NAME', required=True)
-    check_for_dead_letter_messages = get_environment_variable('CHECK_FOR_DL_MESSAGES', default='0') == '1'
-    extractor = Extractor(sbns_connection_string, topic_name, subscription_name, check_for_dead_letter_messages)
-    loader = Loader(
-        sa_connection_string,
-        container_name,
-        topics_dir,
-        topic_name,
-        path_format
-    )
-    _message_count = 0
+    logger.debug(f'Archiving with {config}.')
+    loader = Loader(sa_connection_string, config)
     start_time = time.monotonic()
 
-    while not extractor.finished:
-        try:
-            if is_max_runtime_exceeded(start_time):
-                logger.warning(
-                    f'Max runtime of {MAX_RUNTIME_SECONDS} seconds exceeded for {topic_name}. '
-                    f'Breaking early.'
-                )
-                break
+    if config.requires_session:
+        message_count = drain_sessions(
+            config.max_concurrent_sessions,
+            lambda: (ServiceBusClient.from_connection_string(sbns_connection_string), AutoLockRenewer()),
+            lambda client, renewer: Extractor(
+                sbns_connection_string,
+                config,
+                session_id=NEXT_AVAILABLE_SESSION,
+                client=client,
+                renewer=renewer
+            ),
+            loader,
+            start_time,
+            shutdown
+        )
+    else:
+        extractor = Extractor(sbns_connection_string, config)
+        message_count = drain(extractor, loader, start_time, shutdown)
+
+    logger.info(f'A total of {message_count:,} messages were loaded to blob storage for {config.topic_name}.')
+
+    if config.archive_dead_letters and not shutdown.is_requested():
+        message_count += archive_dead_letters(config, sbns_connection_string, sa_connection_string, shutdown)
 
-            messages = extractor.get_messages()
-            loader.load(messages)
-            extractor.accept_messages(messages)
-            _message_count += len(messages)
-        except ServiceBusError as ex:
-            logger.warning(f'{topic_name} - {ex}')
+    return message_count
 
-    extractor.close()
-    logger.info(f'A total of {_message_count:,} messages were loaded to blob storage for {topic_name}.')
+
+def archive_dead_letters(config: TopicConfig, sbns_connection_string: str, sa_connection_string: str,
+                         shutdown: Shutdown) -> int:
+    """
+    Archive the dead-lettered messages of a topic/subscription to blob storage.
+
+    The dead-letter sub-queue is drained in batches in the same way as the
+    subscription, with its own maximum runtime.
+
+    Parameters
+    ----------
+    config : TopicConfig
+        The configuration of the topic/subscription to archive.
+    sbns_connection_string : str
+        The connection string for the Service Bus namespace.
+    sa_connection_string : str
+        The connection string for the storage account.
+    shutdown : Shutdown
+        A shutdown that may be requested while the messages are being archived.
+
+    Returns
+    -------
+    int
+        The number of dead-lettered messages loaded to blob storage.
+    """
+    loader = Loader(sa_connection_string, config, dead_letter=True)
+    extractor = Extractor(sbns_connection_string, config, sub_queue=ServiceBusSubQueue.DEAD_LETTER)
+    message_count = drain(extractor, loader, time.monotonic(), shutdown)
+    logger.info(f'A total of {message_count:,} dead-lettered messages were loaded for {config.topic_name}.')
+    return message_count
 
 
-def main_wrapper() -> int:
+def main_wrapper(shutdown: Shutdown = None, config: TopicConfig = None) -> int:
     """
     Call main from outside of the Azure Function App tooling.
 
     Used by the ulti-topic-entrypoint.py script.
 
+    Parameters
+    ----------
+    shutdown : Shutdown, optional
+        A shutdown that may be requested (e.g. by a signal handler) while
+        main is running.
+    config : TopicConfig, optional
+        The configuration of the topic to archive, by default one created
+        from the environment variables.
+
     Returns
     -------
     int
@@ -347,7 +2431,112 @@ def main_wrapper() -> int:
     """
     global _message_count
 
-    timer = MockTimer()
+    timer = MockTimer(shutdown, config)
     _message_count = 0
     main(timer)
     return _message_count
+
+
+def read_config_file(path: str) -> dict:
+    """
+    Read a topic configuration file.
+
+    The file is a JSON object with an optional "defaults" object of
+    settings that apply to every topic and an optional "topics" object of
+    settings for individual topics.  The keys of "topics" are either a
+    topic name or "topic:subscription".  For example:
+
+        {
+            "defaults": {"max_messages_in_batch": 500},
+            "topics": {
+                "busy-topic": {"max_messages_in_batch": 2000, "wait_time_seconds": 1},
+                "quiet-topic:archive": {"output_format": "envelope"}
+            }
+        }
+
+    Parameters
+    ----------
+    path : str
+        The path to the file.  If None or empty, no file is read.
+
+    Returns
+    -------
+    dict
+        The contents of the file.
+
+    Raises
+    ------
+    ValueError
+        If the file contains unexpected keys.
+    """
+    if not path:
+        return {}
+
+    with open(path) as stream:
+        config_file = json.load(stream)
+
+    unknown_keys = sorted(set(config_file) - {'defaults', 'topics'})
+
+    if unknown_keys:
+        raise ValueError(f'Unknown keys in {path}: {", ".join(unknown_keys)}.')
+
+    return config_file
+
+
+def topic_configs(topics_and_subscriptions: list[tuple], config_file: dict) -> list[TopicConfig]:
+    """
+    Create the configuration for each topic/subscription.
+
+    Parameters
+    ----------
+    topics_and_subscriptions : list[tuple]
+        Tuples of topic name and subscription name (e.g. as parsed from
+        TOPICS_AND_SUBSCRIPTIONS).
+    config_file : dict
+        The contents of the configuration file (see read_config_file).
+        Any "topic:subscription" in the file that is not in
+        topics_and_subscriptions is also configured.
+
+    Returns
+    -------
+    list[TopicConfig]
+        The configuration for each topic/subscription.
+
+    Raises
+    ------
+    ValueError
+        If a topic is not paired with a subscription.
+    """
+    keys = [':'.join(item) for item in topics_and_subscriptions]
+    keys += [key for key in config_file.get('topics', {}) if ':' in key]
+    return [
+        TopicConfig.from_config_file(*split_topic_and_subscription(key), config_file)
+        for key in dict.fromkeys(keys)
+    ]
+
+
+def split_topic_and_subscription(key: str) -> tuple[str, str]:
+    """
+    Split a "topic:subscription" string.
+
+    Parameters
+    ----------
+    key : str
+        The topic and subscription separated by a colon.
+
+    Returns
+    -------
+    tuple[str, str]
+        The topic name and the subscription name.
+
+    Raises
+    ------
+    ValueError
+        If the topic or the subscription is missing.
+    """
+    topic_name, _, subscription_name = key.partition(':')
+
+    if not (topic_name and subscription_name):
+        raise ValueError(f'Expected "topic:subscription", not "{key}".')
+
+    return topic_name, subscription_name
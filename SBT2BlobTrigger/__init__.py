@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Load the batches of messages delivered by a Service Bus trigger to blob storage."""
+import os
+import threading
+import types
+
+from azure.servicebus.amqp import AmqpMessageBodyType
+
+import SBT2Blob
+
+logger = SBT2Blob.logger
+_loader = None
+_loader_lock = threading.Lock()
+
+
+class DeliveredMessage:
+    """
+    Adapt a message delivered by the trigger for the SBT2Blob encoders.
+
+    An azure.functions.ServiceBusMessage has the same properties as a
+    received azure.servicebus message, but not the raw AMQP message that
+    EnvelopeEncoder reads the header and properties from, nor the string
+    representation of the body that TextEncoder writes.
+
+    Parameters
+    ----------
+    message : azure.functions.ServiceBusMessage
+        The message delivered by the trigger.
+    """
+
+    body_type = AmqpMessageBodyType.DATA
+
+    def __init__(self, message):
+        self.message = message
+        self.body = message.get_body()
+        time_to_live = message.time_to_live
+        self.raw_amqp_message = types.SimpleNamespace(
+            header=types.SimpleNamespace(
+                delivery_count=message.delivery_count,
+                time_to_live=int(time_to_live.total_seconds() * 1000) if time_to_live else None
+            ),
+            properties=types.SimpleNamespace(
+                message_id=message.message_id,
+                correlation_id=message.correlation_id,
+                group_id=message.session_id,
+                reply_to_group_id=message.reply_to_session_id,
+                content_type=message.content_type,
+                subject=message.subject,
+                to=message.to,
+                reply_to=message.reply_to
+            )
+        )
+
+    def __getattr__(self, name: str):
+        """Get the other properties from the delivered message."""
+        return getattr(self.message, name)
+
+    def __str__(self) -> str:
+        """Get the body as a string, as for an azure.servicebus message."""
+        return self.body.decode()
+
+
+def get_loader() -> SBT2Blob.Loader:
+    """
+    Get the loader for TOPIC_NAME and SUBSCRIPTION_NAME.
+
+    The loader (and so its blob service client and duplicate filter) is
+    created on the first invocation and reused by later ones.
+
+    Returns
+    -------
+    SBT2Blob.Loader
+        The loader to write the messages with.
+    """
+    global _loader
+
+    with _loader_lock:
+        if _loader is None:
+            _loader = SBT2Blob.Loader(
+                SBT2Blob.get_environment_variable('STORAGE_ACCOUNT_CONNECTION_STRING', required=True),
+                SBT2Blob.TopicConfig.from_environment()
+            )
+
+    return _loader
+
+
+def main(messages) -> None:
+    """
+    Load a batch of messages delivered by the trigger.
+
+    If an exception is raised, the host abandons the messages so that they
+    are redelivered, otherwise it completes them.
+
+    Parameters
+    ----------
+    messages : list[azure.functions.ServiceBusMessage]
+        The messages delivered by the trigger (the binding has a cardinality
+        of "many"), which is never empty.  It is deliberately not annotated
+        so that azure.functions does not have to be imported.
+    """
+    logger.setLevel(os.getenv('LOG_LEVEL', 'WARN'))
+    loader = get_loader()
+    delivered_messages = [DeliveredMessage(message) for message in messages]
+    session_id = messages[0].session_id if loader.config.requires_session else None
+
+    if loader.duplicate_filter:
+        delivered_messages = loader.duplicate_filter.unseen(delivered_messages)
+
+    loader.load(delivered_messages, session_id)
+
+    if loader.duplicate_filter:
+        loader.duplicate_filter.remember(delivered_messages)
+
+    SBT2Blob.record_first_message(delivered_messages)
+    logger.info(f'Loaded {len(delivered_messages):,} of {len(messages):,} messages for {loader.config.topic_name}.')
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+"""Read archived messages back from blob storage for backfills."""
+import argparse
+import base64
+import bz2
+import collections
+import concurrent.futures
+import datetime
+import gzip
+import json
+import logging
+import lzma
+import os
+import sys
+from typing import Iterator
+
+import azure.storage.blob
+from azure.servicebus import ServiceBusClient, ServiceBusMessage
+from azure.servicebus.exceptions import MessageSizeExceededError
+
+import SBT2Blob
+
+DECOMPRESSORS = {
+    'bz2': bz2.decompress,
+    'gzip': gzip.decompress,
+    'none': bytes,
+    'xz': lzma.decompress
+}
+REPUBLISHED_FIELDS = (
+    'application_properties',
+    'content_type',
+    'correlation_id',
+    'message_id',
+    'partition_key',
+    'reply_to',
+    'reply_to_session_id',
+    'session_id',
+    'subject',
+    'to'
+)
+logging.basicConfig()
+logger = logging.getLogger(os.path.basename(__file__))
+
+
+class ArchiveReader:
+    """
+    Read the messages archived for a topic over a time range.
+
+    Parameters
+    ----------
+    connection_string : str
+        The connection string for the storage account.
+    load_uri : SBT2Blob.LoadURI
+        The load URI that the messages were archived with.
+    start : datetime.datetime
+        The start of the time range.  A naive timestamp is taken to be UTC.
+    end : datetime.datetime
+        The end of the time range (inclusive).  A naive timestamp is taken
+        to be UTC.
+    max_workers : int
+        The number of blobs to download and decompress concurrently.
+
+    Raises
+    ------
+    ValueError
+        If the path format does not contain a timestamp, as the blobs could
+        not be selected by the time range.
+    """
+
+    def __init__(self, connection_string: str, load_uri: SBT2Blob.LoadURI, start: datetime.datetime,
+                 end: datetime.datetime, max_workers: int):
+        if load_uri.granularity() is None:
+            raise ValueError(
+                f'The path format "{load_uri.path_format}" of {load_uri.topic_name} does not contain a timestamp '
+                '(YYYY), so the archived blobs cannot be selected by time range.'
+            )
+
+        client = azure.storage.blob.BlobServiceClient.from_connection_string(connection_string)
+        self.container_client = client.get_container_client(load_uri.container_name)
+        self.load_uri = load_uri
+        self.start = SBT2Blob.floor_timestamp(to_utc(start), load_uri.granularity())
+        self.end = to_utc(end)
+        self.max_workers = max_workers
+
+    def blob_names(self) -> list[str]:
+        """
+        List the blobs for the time range in sequence order.
+
+        The blobs of a session-enabled subscription are written per session,
+        so the sequence numbers of the blobs of concurrent sessions overlap.
+        They are sorted by the offset of their last message, which keeps the
+        messages of each session in order, but not the messages of
+        different sessions.
+
+        Returns
+        -------
+        list[str]
+            The names of the blobs, sorted by offset.
+        """
+        blobs = {}
+
+        for prefix in self.load_uri.prefixes(self.start, self.end):
+            logger.debug(f'Listing blobs with the prefix "{prefix}".')
+
+            for blob_name in self.container_client.list_blob_names(name_starts_with=prefix):
+                offset, timestamp = self.load_uri.parse(blob_name)
+
+                if offset is not None and self.is_in_range(timestamp):
+                    blobs[blob_name] = offset
+
+        return sorted(blobs, key=blobs.get)
+
+    def download(self, blob_name: str) -> list[bytes]:
+        """
+        Download and decompress a blob.
+
+        Parameters
+        ----------
+        blob_name : str
+            The name of the blob within the container.
+
+        Returns
+        -------
+        list[bytes]
+            The messages contained within the blob.
+        """
+        data = self.container_client.download_blob(blob_name).readall()
+        return DECOMPRESSORS[self.load_uri.codec](data).splitlines()
+
+    def is_in_range(self, timestamp: datetime.datetime) -> bool:
+        """
+        Check if the timestamp of a blob is within the time range.
+
+        Parameters
+        ----------
+        timestamp : datetime.datetime
+            The timestamp parsed from the blob name.
+
+        Returns
+        -------
+        bool
+            True if the timestamp is within the time range.
+        """
+        return self.start <= timestamp <= self.end
+
+    def messages(self) -> Iterator[bytes]:
+        """
+        Yield the archived messages in sequence order (see blob_names).
+
+        Blobs are downloaded concurrently, but no more than twice max_workers
+        blobs are held in memory at once.
+
+        Yields
+        ------
+        bytes
+            Each archived message (one line of a blob).
+        """
+        blob_names = collections.deque(self.blob_names())
+        logger.info(f'Reading {len(blob_names):,} blobs.')
+        pending = collections.deque()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while blob_names or pending:
+                while blob_names and len(pending) < self.max_workers * 2:
+                    pending.append(executor.submit(self.download, blob_names.popleft()))
+
+                yield from pending.popleft().result()
+
+
+def application_properties(envelope: dict) -> dict:
+    """
+    Restore the application properties from an envelope.
+
+    Parameters
+    ----------
+    envelope : dict
+        The envelope read from the archive.
+
+    Returns
+    -------
+    dict
+        The application properties, with the base64 encoded values decoded
+        back to bytes.
+    """
+    response = envelope.get('application_properties') or {}
+
+    for key, encoding in envelope.get('application_property_encodings', {}).items():
+        if encoding == 'base64':
+            response[key] = base64.b64decode(response[key])
+
+    return response
+
+
+def to_utc(timestamp: datetime.datetime) -> datetime.datetime:
+    """
+    Convert a timestamp to UTC without timezone information.
+
+    Parameters
+    ----------
+    timestamp : datetime.datetime
+        The timestamp to convert.  A naive timestamp is taken to be UTC.
+
+    Returns
+    -------
+    datetime.datetime
+        The naive UTC timestamp, as parsed from the blob names.
+    """
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    return timestamp
+
+
+def to_message(line: bytes, output_format: str) -> ServiceBusMessage:
+    """
+    Convert an archived line back into a message.
+
+    Parameters
+    ----------
+    line : bytes
+        The line read from the archive.
+    output_format : str
+        The output format that the archive was written with.
+
+    Returns
+    -------
+    ServiceBusMessage
+        The message to be published.  If the archive is in the envelope
+        format, the body and properties are restored from the envelope
+        (including base64 encoded bodies and application property values).
+    """
+    if output_format != 'envelope':
+        return ServiceBusMessage(line)
+
+    envelope = json.loads(line)
+    body = envelope['body']
+
+    if envelope.get('body_encoding') == 'base64':
+        body = base64.b64decode(body)
+
+    kwargs = {key: envelope[key] for key in REPUBLISHED_FIELDS if key in envelope}
+    kwargs['application_properties'] = application_properties(envelope)
+    return ServiceBusMessage(body, **kwargs)
+
+
+def publish(connection_string: str, topic_name: str, messages: Iterator[bytes], output_format: str) -> int:
+    """
+    Publish messages onto a topic in batches.
+
+    Parameters
+    ----------
+    connection_string : str
+        The connection string for the Service Bus namespace.
+    topic_name : str
+        The name of the topic to publish to.
+    messages : Iterator[bytes]
+        The archived lines of the messages to be published.
+    output_format : str
+        The output format that the archive was written with.
+
+    Returns
+    -------
+    int
+        The number of messages published.
+    """
+    count = 0
+
+    with ServiceBusClient.from_connection_string(connection_string) as client:
+        with client.get_topic_sender(topic_name) as sender:
+            batch = sender.create_message_batch()
+
+            for line in messages:
+                message = to_message(line, output_format)
+
+                try:
+                    batch.add_message(message)
+                except MessageSizeExceededError:
+                    sender.send_messages(batch)
+                    batch = sender.create_message_batch()
+                    batch.add_message(message)
+
+                count += 1
+
+            if len(batch):
+                sender.send_messages(batch)
+
+    return count
+
+
+def write(path: str, messages: Iterator[bytes]) -> int:
+    """
+    Write messages to a local file, one per line.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.  If set to "-", write to standard output.
+    messages : Iterator[bytes]
+        The bodies of the messages to be written.
+
+    Returns
+    -------
+    int
+        The number of messages written.
+    """
+    count = 0
+    stream = sys.stdout.buffer if path == '-' else open(path, 'wb')
+
+    try:
+        for body in messages:
+            stream.write(body + b'\n')
+            count += 1
+    finally:
+        if stream is not sys.stdout.buffer:
+            stream.close()
+
+    return count
+
+
+def get_args(args: list = None) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+
+    Parameters
+    ----------
+    args : list, optional
+        The arguments to parse, by default sys.argv.
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('topic_name', help='The name of the topic that was archived.')
+    parser.add_argument('start', type=datetime.datetime.fromisoformat, help='The start time (ISO 8601).')
+    parser.add_argument('end', type=datetime.datetime.fromisoformat, help='The end time (ISO 8601).')
+    parser.add_argument('-d', '--dead-letter', action='store_true',
+                        help='Read the archived dead-lettered messages of the topic.')
+    parser.add_argument('-o', '--output', default='-', help='The file to write to.  Default is standard output.')
+    parser.add_argument('-p', '--publish', metavar='TOPIC', help='Re-publish the messages onto this topic.')
+    parser.add_argument('-s', '--subscription', default='',
+                        help='The subscription that was archived (for settings in TOPICS_CONFIG_FILE).')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='The number of concurrent downloads.')
+    return parser.parse_args(args)
+
+
+def main(args: argparse.Namespace) -> int:
+    """
+    Read the archive and write or re-publish the messages.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command line arguments.
+
+    Returns
+    -------
+    int
+        The number of messages read.
+    """
+    logger.setLevel(os.getenv('LOG_LEVEL', 'WARN'))
+    config = SBT2Blob.TopicConfig.from_config_file(
+        args.topic_name,
+        args.subscription,
+        SBT2Blob.read_config_file(os.getenv('TOPICS_CONFIG_FILE'))
+    )
+    reader = ArchiveReader(
+        SBT2Blob.get_environment_variable('STORAGE_ACCOUNT_CONNECTION_STRING', required=True),
+        config.load_uri(args.dead_letter),
+        args.start,
+        args.end,
+        args.workers
+    )
+
+    if args.publish:
+        sbns_connection_string = SBT2Blob.get_environment_variable('SERVICE_BUS_CONNECTION_STRING', required=True)
+        output_format = 'envelope' if args.dead_letter else config.output_format
+        count = publish(sbns_connection_string, args.publish, reader.messages(), output_format)
+    else:
+        count = write(args.output, reader.messages())
+
+    logger.info(f'A total of {count:,} messages were read for {args.topic_name}.')
+    return count
+
+
+if __name__ == '__main__':
+    main(get_args())
@@ -1,13 +1,24 @@
 #!/usr/bin/env python
 """A shim for the ghcr.io/cbdq-io/func-sbt-to-blob image to run multiple topics."""
+import functools
 import os
 import signal
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, make_server
 
-from prometheus_client import Counter, start_http_server
+from prometheus_client import Counter, Gauge, make_wsgi_app
+from prometheus_client.exposition import ThreadingWSGIServer
 
 import SBT2Blob
 
 
+class QuietRequestHandler(WSGIRequestHandler):
+    """A request handler that does not log every request (i.e. every scrape or probe)."""
+
+    def log_message(self, format, *args) -> None:
+        """Do not log the request."""
+
+
 class Archivist:
     """
     A class for archiving multiple topics and subscriptions.
@@ -17,12 +28,30 @@ class Archivist:
     topics_and_subscriptions : str
         A string of comma separated values that are themselves colon
         separated values for topic and subscription.
+    config_file : str
+        The path to an optional JSON file with per-topic settings (see
+        SBT2Blob.read_config_file).
+
+    Raises
+    ------
+    ValueError
+        If no topics and subscriptions are configured.
     """
 
-    def __init__(self, topics_and_subscriptions: str = os.getenv('TOPICS_AND_SUBSCRIPTIONS', '')) -> None:
+    def __init__(self, topics_and_subscriptions: str = os.getenv('TOPICS_AND_SUBSCRIPTIONS', ''),
+                 config_file: str = os.getenv('TOPICS_CONFIG_FILE')) -> None:
         self._topics_and_subscriptions = []
         self._is_running = True
+        self.shutdown = SBT2Blob.Shutdown()
         self.topics_and_subscriptions(topics_and_subscriptions)
+        self.topic_configs = SBT2Blob.topic_configs(
+            self.topics_and_subscriptions(),
+            SBT2Blob.read_config_file(config_file)
+        )
+
+        if not self.topic_configs:
+            raise ValueError('No topics to archive.  Set TOPICS_AND_SUBSCRIPTIONS or the topics in TOPICS_CONFIG_FILE.')
+
         signal.signal(signal.SIGINT, self.stop)
         signal.signal(signal.SIGTERM, self.stop)
         prom_metric_prefix = os.getenv('PROMETHEUS_METRIC_NAME_PREFIX', '')
@@ -34,22 +63,138 @@ class Archivist:
             f'{prom_metric_prefix}message_count',
             'The number of messages processed.'
         )
+        self.prom_startup_gauge = Gauge(
+            f'{prom_metric_prefix}startup_seconds',
+            'The time from the process starting to the archivist being ready (mostly importing modules).'
+        )
+        self.prom_startup_gauge.set(SBT2Blob.process_uptime())
+        self.prom_lazy_import_gauge = Gauge(
+            f'{prom_metric_prefix}startup_lazy_import_seconds',
+            'The time spent importing the blob storage modules on first use.'
+        )
+        self.prom_lazy_import_gauge.set_function(SBT2Blob.import_seconds)
+        self.prom_first_message_gauge = Gauge(
+            f'{prom_metric_prefix}startup_first_message_seconds',
+            'The time from the process starting to the first message being archived.'
+        )
+        self.prom_first_message_gauge.set_function(SBT2Blob.first_message_seconds)
+        SBT2Blob.COUNTERS['throttle_events'] = Counter(
+            f'{prom_metric_prefix}throttle_events',
+            'The number of times that Service Bus or storage has throttled the archivist.'
+        )
+        SBT2Blob.COUNTERS['backoff_seconds'] = Counter(
+            f'{prom_metric_prefix}backoff_seconds',
+            'The time spent backing off from errors.'
+        )
+        self.prom_throttle_scale_gauge = Gauge(
+            f'{prom_metric_prefix}throttle_scale',
+            'The fraction of the batch size and concurrent sessions currently in use (1 when not throttled).'
+        )
+        self.prom_throttle_scale_gauge.set_function(lambda: SBT2Blob.THROTTLE.scale)
+        SBT2Blob.COUNTERS['duplicate_messages'] = Counter(
+            f'{prom_metric_prefix}duplicate_messages',
+            'The number of redelivered messages dropped by the duplicate filters.'
+        )
         self.prometheus_port = int(
             os.getenv(
                'PROMETHEUS_PORT',
                '8000'
             )
         )
+        self.metrics_app = make_wsgi_app()
+        self.backlog_monitor = SBT2Blob.BacklogMonitor(
+            os.getenv('SERVICE_BUS_CONNECTION_STRING'),
+            [(config.topic_name, config.subscription_name) for config in self.topic_configs]
+        )
+        self.prom_active_gauge = Gauge(
+            f'{prom_metric_prefix}subscription_active_messages',
+            'The number of active messages in the subscription (polled every BACKLOG_POLL_SECONDS).',
+            ['topic', 'subscription']
+        )
+        self.prom_dead_letter_gauge = Gauge(
+            f'{prom_metric_prefix}subscription_dead_letter_messages',
+            'The number of dead-lettered messages in the subscription (polled every BACKLOG_POLL_SECONDS).',
+            ['topic', 'subscription']
+        )
+
+        for topic_name, subscription_name in self.backlog_monitor.topics_and_subscriptions:
+            for gauge, kind in ((self.prom_active_gauge, 'active'), (self.prom_dead_letter_gauge, 'dead_letter')):
+                gauge.labels(topic_name, subscription_name).set_function(
+                    functools.partial(self.backlog_monitor.message_count, topic_name, subscription_name, kind)
+                )
+
+    def app(self, environ: dict, start_response) -> list[bytes]:
+        """
+        Serve the liveness and readiness probes and the Prometheus metrics.
+
+        Parameters
+        ----------
+        environ : dict
+            The WSGI environment of the request.
+        start_response : callable
+            The WSGI start_response callable.
+
+        Returns
+        -------
+        list[bytes]
+            The body of the response.
+        """
+        path = environ.get('PATH_INFO')
+
+        if path == '/livez':
+            return self.probe(True, start_response)
+        elif path == '/readyz':
+            return self.probe(self.is_ready(), start_response)
+
+        return self.metrics_app(environ, start_response)
+
+    def is_ready(self) -> bool:
+        """
+        Check if the archivist is ready.
+
+        Returns
+        -------
+        bool
+            True if the archivist is running and a shutdown has not been
+            requested.
+        """
+        return self._is_running and not self.shutdown.is_requested()
+
+    @staticmethod
+    def probe(is_ok: bool, start_response) -> list[bytes]:
+        """
+        Respond to a liveness or readiness probe.
+
+        Parameters
+        ----------
+        is_ok : bool
+            Respond with 200 if True, otherwise 503.
+        start_response : callable
+            The WSGI start_response callable.
+
+        Returns
+        -------
+        list[bytes]
+            The body of the response.
+        """
+        status, body = ('200 OK', b'ok\n') if is_ok else ('503 Service Unavailable', b'unavailable\n')
+        start_response(status, [('Content-Type', 'text/plain')])
+        return [body]
 
     def run(self) -> None:
         """Run the class until a signal is received."""
-        start_http_server(self.prometheus_port)
+        server = make_server(
+            '', self.prometheus_port, self.app, server_class=ThreadingWSGIServer, handler_class=QuietRequestHandler
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.backlog_monitor.start()
 
         while self._is_running:
-            for (topic_name, subscription_name) in self.topics_and_subscriptions():
-                os.environ['TOPIC_NAME'] = topic_name
-                os.environ['SUBSCRIPTION_NAME'] = subscription_name
-                message_count = SBT2Blob.main_wrapper()
+            for topic_config in self.topic_configs:
+                if not self._is_running:
+                    break
+
+                message_count = SBT2Blob.main_wrapper(self.shutdown, topic_config)
 
                 if message_count:
                     self.prom_files_couner.inc()
@@ -57,8 +202,15 @@ class Archivist:
                 self.prom_messages_counter.inc(message_count)
 
     def stop(self, signum, frame) -> None:
-        """Handle a signal if received to initiate a stop."""
+        """
+        Handle a signal if received to initiate a stop.
+
+        The topic currently being archived stops receiving straight away and
+        any in-flight upload has SHUTDOWN_TIMEOUT_SECONDS to complete.
+        """
         self._is_running = False
+        self.shutdown.request()
+        self.backlog_monitor.stop()
 
     def topics_and_subscriptions(self, topics_and_subscriptions: str = None) -> list[tuple]:
         """
@@ -78,7 +230,7 @@ class Archivist:
         """
         if topics_and_subscriptions is not None:
             self._topics_and_subscriptions = []
-            items = topics_and_subscriptions.split(',')
+            items = topics_and_subscriptions.split(',') if topics_and_subscriptions else []
 
             for item in items:
                 self._topics_and_subscriptions.append(tuple(item.split(':')))
@@ -0,0 +1,53 @@
+@unit
+Feature: Archive Reader
+    Scenario: Path Format Without A Timestamp
+        Given an archive with the path format ""
+        Then creating the archive reader raises a ValueError
+
+    Scenario Outline: Read Messages In Sequence Order
+        Given an archive with the path format "YYYY/MM/dd"
+        And the archive codec is <codec>
+        And the archive has 10 blobs listed in reverse order
+        When the archive is read with 2 workers
+        Then no more than 4 blobs are downloaded before the first message is read
+        And the messages are read in sequence order
+
+        Examples:
+            | codec |
+            | gzip  |
+            | none  |
+            | xz    |
+
+    Scenario Outline: Time Range In UTC
+        Given an archive with the path format "YYYY/MM/dd/HH"
+        When the archive is read from <start> to <end>
+        Then the time range is <expected_start> to <expected_end>
+
+        Examples:
+            | start                  | end                    | expected_start      | expected_end        |
+            | 2025-02-24T00:30       | 2025-02-24T23:59       | 2025-02-24T00:00:00 | 2025-02-24T23:59:00 |
+            | 2025-02-24T00:30+02:00 | 2025-02-24T23:59+02:00 | 2025-02-23T22:00:00 | 2025-02-24T21:59:00 |
+            | 2025-02-24T00:30-05:00 | 2025-02-24T23:59Z      | 2025-02-24T05:00:00 | 2025-02-24T23:59:00 |
+
+    Scenario Outline: Archived Line To Message
+        Given the archived line <line>
+        When the line is converted to a message with the <output_format> format
+        Then the message body is <body>
+        And the message subject is <subject>
+
+        Examples:
+            | output_format | line                                                                   | body         | subject  |
+            | text          | Hello, World                                                           | Hello, World | None     |
+            | envelope      | {"body_encoding":"utf-8","body":"Hello, World","subject":"greeting"}   | Hello, World | greeting |
+            | envelope      | {"body_encoding":"base64","body":"SGVsbG8sIFdvcmxk","message_id":"42"} | Hello, World | None     |
+
+    Scenario: Archived Application Properties
+        Given the archived line {"body":"Hello","application_properties":{"hash":"//4A","name":"Hello"},"application_property_encodings":{"hash":"base64","name":"utf-8"}}
+        When the line is converted to a message with the envelope format
+        Then the message application property hash is 0xfffe00
+        And the message application property name is Hello
+
+    Scenario: Publish In Batches
+        Given a topic that accepts batches of 2 messages
+        When 5 archived lines are published
+        Then 5 messages are published in batches of 2,2,1
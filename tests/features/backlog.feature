@@ -0,0 +1,30 @@
+@unit
+Feature: Backlog
+    Scenario: Poll Message Counts
+        Given a backlog monitor for topic_a:sub_a and topic_b:sub_b
+        And an administration client that is unable to find topic_b
+        When the backlog is polled
+        Then the poll result is False
+        And the active message count of topic_a:sub_a is 42
+        And the dead-letter message count of topic_a:sub_a is 3
+        And the active message count of topic_b:sub_b is nan
+
+    Scenario: Connection String Not Set
+        Given a backlog monitor for topic_a:sub_a with the connection string None
+        And an administration client that fails to connect 0 times
+        When the backlog monitor runs for 0.1 seconds
+        Then the backlog monitor was still running
+        And the active message count of topic_a:sub_a is nan
+        And the connection was attempted 0 times
+
+    Scenario Outline: Retry After A Failed Connection
+        Given a backlog monitor for topic_a:sub_a with the connection string <connection_string>
+        And an administration client that fails to connect <failure_count> times
+        When the backlog monitor runs until the counts are polled
+        Then the active message count of topic_a:sub_a is 42
+        And the connection was attempted <expected_attempts> times
+
+        Examples:
+            | connection_string | failure_count | expected_attempts |
+            | Endpoint=sb://x/  | 0             | 1                 |
+            | Endpoint=sb://x/  | 2             | 3                 |
@@ -8,12 +8,15 @@ Feature: Test the Container
         And the TestInfra file group is app
 
         Examples:
-            | path                                      |
-            | /home/site/wwwroot/host.json              |
-            | /home/site/wwwroot/SBT2Blob/__init__.py   |
-            | /home/site/wwwroot/SBT2Blob/function.json |
-            | /usr/local/bin/multi-topic-entrypoint.py  |
-            | /usr/local/bin/nukedlq.py                 |
+            | path                                             |
+            | /home/site/wwwroot/host.json                     |
+            | /home/site/wwwroot/SBT2Blob/__init__.py          |
+            | /home/site/wwwroot/SBT2Blob/function.json        |
+            | /home/site/wwwroot/SBT2BlobTrigger/__init__.py   |
+            | /home/site/wwwroot/SBT2BlobTrigger/function.json |
+            | /usr/local/bin/archive-reader.py                 |
+            | /usr/local/bin/multi-topic-entrypoint.py         |
+            | /usr/local/bin/nukedlq.py                        |
 
     Scenario Outline: Absent Files
         Given the TestInfra host with URL "docker://sut" is ready
@@ -34,5 +37,6 @@ Feature: Test the Container
         Examples:
             | pip_package       |
             | azure-servicebus  |
+            | orjson            |
             | prometheus-client |
             | smart_open        |
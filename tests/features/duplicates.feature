@@ -0,0 +1,17 @@
+@unit
+Feature: Duplicates
+    Scenario Outline: Filter Duplicates
+        Given a <duplicate_filter> filter with a window of <window>
+        When the messages <archived> are remembered
+        Then the unseen messages of <received> with a delivery count of <delivery_count> are <unseen>
+        And the duplicate count is <duplicate_count>
+
+        Examples:
+            | duplicate_filter | window | archived               | received              | delivery_count | unseen      | duplicate_count |
+            | sequence_number  | 100    | 1-10                   | 5,10,11,12            | 0              | 11,12       | 2               |
+            | sequence_number  | 100    | 1-10,12-20,11          | 1,11,21               | 0              | 21          | 2               |
+            | sequence_number  | 100    | 1-1000                 | 5,950,1001            | 0              | 5,1001      | 1               |
+            | sequence_number  | 100    | 1-1000,281474976710657 | 5,950,281474976710657 | 0              | 5           | 2               |
+            | message_id       | 100    | 1-10                   | 5,10,11,12            | 1              | 11,12       | 2               |
+            | message_id       | 100    | 1-10                   | 5,10,11,12            | 0              | 5,10,11,12  | 0               |
+            | message_id       | 2      | 1-5                    | 1,3,5                 | 2              | 1           | 2               |
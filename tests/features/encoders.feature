@@ -0,0 +1,64 @@
+@unit
+Feature: Encoders
+    Scenario Outline: Envelope Body
+        Given a message with the body <body>
+        And the JSON library is <library>
+        When the message is encoded with the envelope encoder
+        Then the envelope body is <expected_body>
+        And the envelope body encoding is <body_encoding>
+
+        Examples:
+            | body         | library | expected_body | body_encoding |
+            | Hello, World | orjson  | Hello, World  | utf-8         |
+            | Hello, World | json    | Hello, World  | utf-8         |
+            | 0xfffe00     | orjson  | //4A          | base64        |
+            | 0xfffe00     | json    | //4A          | base64        |
+
+    Scenario Outline: Envelope Body Types
+        Given a received message with the <body_type> body <body>
+        And the JSON library is <library>
+        When the message is encoded with the envelope encoder
+        Then the envelope field body_type is <body_type>
+        And the envelope body JSON is <expected_body>
+        And the envelope body encoding is <body_encoding>
+
+        Examples:
+            | body_type | body                      | library | expected_body       | body_encoding |
+            | sequence  | [[1, b'a'], [{b'k': 2}]]  | orjson  | [[1,"a"],[{"k":2}]] | None          |
+            | sequence  | [[1, b'a'], [{b'k': 2}]]  | json    | [[1,"a"],[{"k":2}]] | None          |
+            | value     | {b'k': b'v', b'n': [1.5]} | orjson  | {"k":"v","n":[1.5]} | None          |
+            | value     | {b'k': b'v', b'n': [1.5]} | json    | {"k":"v","n":[1.5]} | None          |
+            | value     | 0xfffe                    | orjson  | "//4="              | base64        |
+            | value     | 0xfffe                    | json    | "//4="              | base64        |
+            | value     | 42                        | orjson  | 42                  | None          |
+
+    Scenario: Envelope Properties
+        Given a message with the body Hello, World
+        When the message is encoded with the envelope encoder
+        Then the envelope field message_id is 42
+        And the envelope field correlation_id is my-correlation-id
+        And the envelope application property colour is blue
+
+    Scenario Outline: Envelope Application Property Types
+        Given a message with the body Hello, World
+        And the application property <key> is the <value_type> <value>
+        And the JSON library is <library>
+        When the message is encoded with the envelope encoder
+        Then the envelope application property <key> is <expected_value>
+        And the envelope encoding of the application property <key> is <encoding>
+
+        Examples:
+            | key   | value_type | value                                | library | expected_value                       | encoding |
+            | id    | uuid       | 12345678-1234-5678-1234-567812345678 | orjson  | 12345678-1234-5678-1234-567812345678 | None     |
+            | id    | uuid       | 12345678-1234-5678-1234-567812345678 | json    | 12345678-1234-5678-1234-567812345678 | None     |
+            | price | decimal    | 0.10000000000000000001               | orjson  | 0.10000000000000000001               | None     |
+            | price | decimal    | 0.10000000000000000001               | json    | 0.10000000000000000001               | None     |
+            | name  | bytes      | Hello                                | orjson  | Hello                                | utf-8    |
+            | name  | bytes      | Hello                                | json    | Hello                                | utf-8    |
+            | hash  | bytes      | 0xfffe00                             | orjson  | //4A                                 | base64   |
+            | hash  | bytes      | 0xfffe00                             | json    | //4A                                 | base64   |
+
+    Scenario: Text Encoder
+        Given a message with the body Hello, World
+        When the message is encoded with the text encoder
+        Then the encoded data is Hello, World
@@ -0,0 +1,20 @@
+@unit
+Feature: Multi-Topic Entrypoint
+    Scenario: No Topics Configured
+        Given no topics and subscriptions are configured
+        Then creating the archivist raises a ValueError
+
+    Scenario Outline: Probes
+        Given an archivist that is <state>
+        When the path <path> is requested
+        Then the response status is <expected_status>
+        And the response body is <expected_body>
+
+        Examples:
+            | state    | path     | expected_status         | expected_body |
+            | running  | /livez   | 200 OK                  | ok            |
+            | running  | /readyz  | 200 OK                  | ok            |
+            | stopping | /livez   | 200 OK                  | ok            |
+            | stopping | /readyz  | 503 Service Unavailable | unavailable   |
+            | stopped  | /readyz  | 503 Service Unavailable | unavailable   |
+            | running  | /metrics | 200 OK                  | metrics       |
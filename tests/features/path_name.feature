@@ -13,3 +13,73 @@ Feature: Path Name
         Examples:
             | container_name | topics_dir | path_format                              | timestamp        | topic_name | offset | uri                                                                                                            |
             | mycontainer    | topics     | year=YYYY/month=MM/day=dd/hour=HH/min=mm | 2025-02-24T15:56 | mytopic    | 42     | azure://mycontainer/topics/mytopic/year=2025/month=02/day=24/hour=15/min=56/mytopic+0000000000000000042.bin.gz |
+
+    Scenario: Session Path Name
+        Given the container name is mycontainer
+        And the topics directory is topics
+        And the path format is YYYY/MM/dd
+        And the timestamp is 2025-02-24T15:56
+        And the topic name is mytopic
+        And the offset is 42
+        And the session ID is order/1
+        When the load URI is created
+        Then the path is azure://mycontainer/topics/mytopic/2025/02/24/mytopic+order%2F1+0000000000000000042.bin.gz
+
+    Scenario: Dead-Letter Path Name
+        Given the container name is mycontainer
+        And the topics directory is topics
+        And the path format is YYYY/MM/dd
+        And the timestamp is 2025-02-24T15:56
+        And the topic name is mytopic
+        And the offset is 42
+        And the sub-directory is deadletter
+        When the load URI is created
+        Then the path is azure://mycontainer/topics/mytopic/deadletter/2025/02/24/mytopic+0000000000000000042.bin.gz
+
+    Scenario Outline: Codec Path Name
+        Given the container name is mycontainer
+        And the topics directory is topics
+        And the path format is YYYY/MM/dd
+        And the timestamp is 2025-02-24T15:56
+        And the topic name is mytopic
+        And the offset is 42
+        And the codec is <codec>
+        When the load URI is created
+        Then the path is <uri>
+        And the blob name topics/mytopic/2025/02/24/mytopic+0000000000000000042.bin.gz has the offset <offset> and the timestamp <timestamp>
+
+        Examples:
+            | codec | uri                                                                              | offset | timestamp        |
+            | gzip  | azure://mycontainer/topics/mytopic/2025/02/24/mytopic+0000000000000000042.bin.gz | 42     | 2025-02-24T00:00 |
+            | none  | azure://mycontainer/topics/mytopic/2025/02/24/mytopic+0000000000000000042.bin    | None   | None             |
+            | xz    | azure://mycontainer/topics/mytopic/2025/02/24/mytopic+0000000000000000042.bin.xz | None   | None             |
+
+    Scenario Outline: Parse Blob Name
+        Given the container name is mycontainer
+        And the topics directory is topics
+        And the path format is <path_format>
+        And the topic name is mytopic
+        When the load URI is created
+        Then the blob name <blob_name> has the offset <offset> and the timestamp <timestamp>
+
+        Examples:
+            | path_format                       | blob_name                                                                           | offset | timestamp        |
+            | year=YYYY/month=MM/day=dd/hour=HH | topics/mytopic/year=2025/month=02/day=24/hour=15/mytopic+0000000000000000042.bin.gz | 42     | 2025-02-24T15:00 |
+            | YYYY/MM/dd                        | topics/mytopic/2025/02/24/mytopic+0000000000000001024.bin.gz                        | 1024   | 2025-02-24T00:00 |
+            | YYYY/MM/dd                        | topics/mytopic/2025/02/24/mytopic+order%2F1+0000000000000001024.bin.gz              | 1024   | 2025-02-24T00:00 |
+            | YYYY/MM/dd                        | topics/mytopic/2025/02/24/othertopic+0000000000000001024.bin.gz                     | None   | None             |
+            | YYYY/MM/dd                        | topics/mytopic/deadletter/2025/02/24/mytopic+0000000000000001024.bin.gz             | None   | None             |
+
+    Scenario Outline: List Prefixes
+        Given the container name is mycontainer
+        And the topics directory is topics
+        And the path format is <path_format>
+        And the topic name is mytopic
+        When the load URI is created
+        Then the prefixes from <start> to <end> start with <prefixes>
+
+        Examples:
+            | path_format                       | start            | end              | prefixes                                                                                          |
+            | year=YYYY/month=MM/day=dd/hour=HH | 2025-02-24T23:56 | 2025-02-25T00:10 | topics/mytopic/year=2025/month=02/day=24/hour=23,topics/mytopic/year=2025/month=02/day=25/hour=00 |
+            | YYYY/MM                           | 2024-12-24T00:00 | 2025-01-02T00:00 | topics/mytopic/2024/12,topics/mytopic/2025/01                                                     |
+            | YYYY/MM/dd/HH/mm                  | 2024-12-24T00:00 | 2025-01-02T00:00 | topics/mytopic/2024/12/24/00,topics/mytopic/2024/12/24/01                                         |
@@ -0,0 +1,35 @@
+@unit
+Feature: Sessions
+    Scenario Outline: Drain Sessions
+        Given the sessions <sessions> with <message_count> messages each
+        When the sessions are drained by <max_concurrent_sessions> workers
+        Then the number of messages loaded is <expected_count>
+        And every session is accepted once
+        And each of the <max_concurrent_sessions> workers opens and closes 1 connection
+
+        Examples:
+            | sessions      | message_count | max_concurrent_sessions | expected_count |
+            | none          | 0             | 2                       | 0              |
+            | a             | 3             | 2                       | 3              |
+            | a,b,c,d,e     | 2             | 2                       | 10             |
+            | a,b,c,d,e,f,g | 1             | 8                       | 7              |
+
+    Scenario: Register Session Lock Once
+        Given a session extractor
+        When 3 batches of messages are received from the session
+        Then the session lock is registered 1 time
+
+    Scenario: Keep A Shared Connection Open
+        Given a session extractor on a shared connection
+        When the extractor is closed
+        Then the receiver is closed
+        And the shared connection is open
+
+    Scenario: Recover Concurrency
+        Given the sessions a,b,c,d,e,f,g,h with 1 messages each
+        And the throttle scale is 0.25
+        And each load takes 0.2 seconds
+        When the sessions are drained by 4 workers
+        Then the number of messages loaded is 8
+        And every session is accepted once
+        And the sessions are accepted by more than 1 worker
@@ -0,0 +1,24 @@
+@unit
+Feature: Shutdown
+    Scenario Outline: Load Before Deadline
+        Given a loader that takes <upload_seconds> seconds to upload
+        And a shutdown with a timeout of <timeout_seconds> seconds
+        When a shutdown is requested
+        And the messages are loaded before the deadline
+        Then the load result is <expected_result>
+
+        Examples:
+            | upload_seconds | timeout_seconds | expected_result |
+            | 0.1            | 1.0             | True            |
+            | 2.0            | 0.1             | False           |
+
+    Scenario: Shutdown Not Requested
+        Given a shutdown with a timeout of 1.0 seconds
+        Then the shutdown is not requested
+        And the time remaining is None
+
+    Scenario: Close The Extractor After An Unexpected Error
+        Given a loader that fails with a TypeError
+        When the extractor is drained
+        Then the TypeError is raised
+        And the extractor is closed
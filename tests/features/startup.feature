@@ -0,0 +1,20 @@
+@unit
+Feature: Start Up
+    Scenario: Lazy Import During Prewarm
+        Given a module that takes 0.5 seconds to import
+        When the module is prewarmed
+        And the module is imported lazily
+        Then the module is fully initialised
+        And the import time is at least 0.5 seconds
+
+    Scenario: First Message
+        Given no message has been archived
+        Then the first message seconds is NaN
+        When a batch of 0 messages is archived
+        Then the first message seconds is NaN
+        When a batch of 2 messages is archived
+        Then the first message seconds is the process uptime
+        And the first message seconds does not change on the next batch
+
+    Scenario: Process Uptime
+        Then the process uptime is positive
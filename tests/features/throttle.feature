@@ -0,0 +1,62 @@
+@unit
+Feature: Throttle
+    Scenario Outline: Back Off
+        Given a throttle with a base of 1.0 seconds and a maximum of 8.0 seconds
+        When there are <error_count> errors that are throttled <is_throttled>
+        Then the backoff is at most <max_backoff> seconds
+        And the scaled batch size of 500 is <batch_size>
+
+        Examples:
+            | error_count | is_throttled | max_backoff | batch_size |
+            | 1           | False        | 1.0         | 500        |
+            | 3           | False        | 4.0         | 500        |
+            | 1           | True         | 1.0         | 250        |
+            | 2           | True         | 2.0         | 125        |
+            | 10          | True         | 8.0         | 1          |
+
+    Scenario: Recover Gradually
+        Given a throttle with a base of 1.0 seconds and a maximum of 8.0 seconds
+        When there are 2 errors that are throttled True
+        And there are 2 successes
+        Then the scaled batch size of 500 is 225
+        And the throttle count is 2
+
+    Scenario Outline: Throttled Errors
+        Given the error is <error>
+        Then the error is throttled <is_throttled>
+
+        Examples:
+            | error                     | is_throttled |
+            | ServiceBusServerBusyError | True         |
+            | ServiceBusError           | False        |
+            | HttpResponseError 503     | True         |
+            | HttpResponseError 404     | False        |
+
+    Scenario Outline: Transient Errors
+        Given the error is <error>
+        Then the error is transient <is_transient>
+
+        Examples:
+            | error                     | is_transient |
+            | ServiceBusServerBusyError | True         |
+            | ServiceBusError           | False        |
+            | ServiceRequestError       | True         |
+            | HttpResponseError 502     | True         |
+            | HttpResponseError 404     | False        |
+
+    Scenario Outline: Back Off From A Failed Upload
+        Given an extractor with 3 messages
+        And the locks are renewed for <lock_renewal_seconds> seconds
+        And a loader that fails 2 times with the status code <status_code>
+        When the extractor is drained
+        Then the number of messages loaded is 3
+        And the messages were abandoned <abandon_count> times
+        And the throttle events counter is <throttle_events>
+        And the backoff seconds counter was incremented 2 times
+
+        Examples:
+            | lock_renewal_seconds | status_code | abandon_count | throttle_events |
+            | 120                  | 503         | 0             | 2               |
+            | 120                  | 500         | 0             | 0               |
+            | 120                  | 403         | 2             | 0               |
+            | 0                    | 503         | 2             | 2               |
@@ -0,0 +1,40 @@
+@unit
+Feature: Topic Configuration
+    Scenario Outline: Per-Topic Overrides
+        Given the environment variable CONTAINER_NAME is mycontainer
+        And the topics and subscriptions are mytopic:test,busy:archive
+        And the configuration file is <config_file>
+        When the topic configurations are created
+        Then the <setting> for <topic_and_subscription> is <value>
+
+        Examples:
+            | config_file                                                                                       | setting               | topic_and_subscription | value       |
+            | {}                                                                                                | max_messages_in_batch | busy:archive           | 500         |
+            | {}                                                                                                | container_name        | mytopic:test           | mycontainer |
+            | {"defaults": {"max_messages_in_batch": 100}}                                                      | max_messages_in_batch | mytopic:test           | 100         |
+            | {"defaults": {"max_messages_in_batch": 100}, "topics": {"busy": {"max_messages_in_batch": 2000}}} | max_messages_in_batch | busy:archive           | 2000        |
+            | {"topics": {"busy": {"wait_time_seconds": 2}, "busy:archive": {"wait_time_seconds": 1}}}          | wait_time_seconds     | busy:archive           | 1           |
+            | {"topics": {"busy": {"output_format": "envelope"}}}                                               | output_format         | busy:archive           | envelope    |
+            | {"topics": {"busy": {"output_format": "envelope"}}}                                               | output_format         | mytopic:test           | text        |
+            | {"topics": {"busy": {"codec": "none"}}}                                                           | codec                 | busy:archive           | none        |
+            | {"topics": {"busy": {"codec": "none"}}}                                                           | codec                 | mytopic:test           | gzip        |
+            | {"topics": {"other:sub": {"container_name": "other"}}}                                            | container_name        | other:sub              | other       |
+
+    Scenario Outline: Invalid Configuration
+        Given the environment variable CONTAINER_NAME is mycontainer
+        And the topics and subscriptions are mytopic:test
+        And the configuration file is <config_file>
+        Then creating the topic configurations raises a ValueError
+
+        Examples:
+            | config_file                                        |
+            | {"defaults": {"batch_size": 100}}                  |
+            | {"defaults": {"max_messages_in_batch": "100"}}     |
+            | {"defaults": {"max_messages_in_batch": true}}      |
+            | {"defaults": {"codec": "zip"}}                     |
+            | {"defaults": {"max_messages_in_batch": 0}}         |
+            | {"defaults": {"output_format": "parquet"}}         |
+            | {"defaults": {"duplicate_filter": "bloom"}}        |
+            | {"defaults": {"duplicate_window": 0}}              |
+            | {"defaults": {"container_name": ""}}               |
+            | {"topics": {"mytopic:": {"wait_time_seconds": 1}}} |
@@ -0,0 +1,11 @@
+@unit
+Feature: Service Bus Trigger
+    Scenario Outline: Delivered Message
+        Given a delivered message with the body Hello, World
+        When the delivered message is encoded with the <output_format> encoder
+        Then the encoded data is <expected_data>
+
+        Examples:
+            | output_format | expected_data                                                                                                                                                                                                                                              |
+            | text          | Hello, World                                                                                                                                                                                                                                               |
+            | envelope      | {"body_encoding":"utf-8","body":"Hello, World","delivery_count":1,"time_to_live_ms":60000,"message_id":"42","correlation_id":"my-correlation-id","sequence_number":7,"enqueued_time_utc":"2025-02-24T15:56:00","application_properties":{"colour":"blue"}} |
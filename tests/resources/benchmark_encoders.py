@@ -0,0 +1,63 @@
+"""Compare the throughput of the output formats against the original text path."""
+import gzip
+import io
+import json
+import timeit
+import uuid
+
+import lorem
+from azure.servicebus import ServiceBusMessage
+
+import SBT2Blob
+
+MESSAGE_COUNT = 500
+REPEAT = 20
+
+
+def make_messages() -> list[ServiceBusMessage]:
+    """Create a batch of messages similar to those in the end to end tests."""
+    messages = []
+
+    for idx in range(MESSAGE_COUNT):
+        body = json.dumps({'message_number': idx, 'payload': lorem.sentence()}).encode()
+        messages.append(
+            ServiceBusMessage(
+                body=body,
+                application_properties={'source': 'benchmark', 'index': idx},
+                correlation_id=str(uuid.uuid4()),
+                message_id=str(uuid.uuid4())
+            )
+        )
+
+    return messages
+
+
+def original(messages: list[ServiceBusMessage]) -> None:
+    """Write the messages the way Loader.load did before the encoders."""
+    with gzip.open(io.BytesIO(), 'wt') as stream:
+        for message in messages:
+            body = str(message)
+            stream.write(body + '\n')
+
+
+def encoded(encoder, messages: list[ServiceBusMessage]) -> None:
+    """Write the messages with an encoder the way Loader.load does now."""
+    data = encoder.encode(messages)
+
+    with gzip.open(io.BytesIO(), 'wb') as stream:
+        stream.write(data)
+
+
+def report(name: str, seconds: float) -> None:
+    """Print the throughput of a benchmark."""
+    rate = MESSAGE_COUNT * REPEAT / seconds
+    print(f'{name:<24} {seconds:8.3f}s {rate:12,.0f} messages/s')
+
+
+messages = make_messages()
+report('original text', timeit.timeit(lambda: original(messages), number=REPEAT))
+report('text', timeit.timeit(lambda: encoded(SBT2Blob.TextEncoder(), messages), number=REPEAT))
+report('envelope', timeit.timeit(lambda: encoded(SBT2Blob.EnvelopeEncoder(), messages), number=REPEAT))
+orjson, SBT2Blob.orjson = SBT2Blob.orjson, None
+report('envelope (json)', timeit.timeit(lambda: encoded(SBT2Blob.EnvelopeEncoder(), messages), number=REPEAT))
+SBT2Blob.orjson = orjson
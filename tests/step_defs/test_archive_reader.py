@@ -0,0 +1,261 @@
+"""Archive Reader feature tests."""
+import bz2
+import datetime
+import gzip
+import importlib.util
+import lzma
+import os
+import threading
+import types
+
+import pytest
+from azure.servicebus.exceptions import MessageSizeExceededError
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+ARCHIVE_READER_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'archive-reader.py')
+spec = importlib.util.spec_from_file_location('archive_reader', ARCHIVE_READER_PATH)
+archive_reader = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(archive_reader)
+COMPRESSORS = {
+    'bz2': bz2.compress,
+    'gzip': gzip.compress,
+    'none': bytes,
+    'xz': lzma.compress
+}
+START = datetime.datetime(2025, 2, 24)
+
+
+@scenario('archive_reader.feature', 'Path Format Without A Timestamp')
+def test_path_format_without_a_timestamp():
+    """Path Format Without A Timestamp."""
+
+
+@scenario('archive_reader.feature', 'Read Messages In Sequence Order')
+def test_read_messages_in_sequence_order():
+    """Read Messages In Sequence Order."""
+
+
+@scenario('archive_reader.feature', 'Time Range In UTC')
+def test_time_range_in_utc():
+    """Time Range In UTC."""
+
+
+@scenario('archive_reader.feature', 'Archived Line To Message')
+def test_archived_line_to_message():
+    """Archived Line To Message."""
+
+
+@scenario('archive_reader.feature', 'Archived Application Properties')
+def test_archived_application_properties():
+    """Archived Application Properties."""
+
+
+@scenario('archive_reader.feature', 'Publish In Batches')
+def test_publish_in_batches():
+    """Publish In Batches."""
+
+
+class FakeContainerClient:
+    """A container client that serves blobs from memory."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.download_count = 0
+        self._lock = threading.Lock()
+
+    def list_blob_names(self, name_starts_with: str) -> list[str]:
+        return [name for name in self.blobs if name.startswith(name_starts_with)]
+
+    def download_blob(self, blob_name: str) -> types.SimpleNamespace:
+        with self._lock:
+            self.download_count += 1
+
+        return types.SimpleNamespace(readall=lambda: self.blobs[blob_name])
+
+
+class FakeBatch(list):
+    """A message batch that holds a limited number of messages."""
+
+    def __init__(self, max_messages: int):
+        super().__init__()
+        self.max_messages = max_messages
+
+    def add_message(self, message) -> None:
+        if len(self) == self.max_messages:
+            raise MessageSizeExceededError(message='The batch is full.')
+
+        self.append(message)
+
+
+class FakeSender:
+    """A topic sender that records the batches that are sent."""
+
+    def __init__(self, max_messages: int):
+        self.max_messages = max_messages
+        self.batches = []
+
+    def __enter__(self):
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args):
+        """Exit the context."""
+        return False
+
+    def create_message_batch(self) -> FakeBatch:
+        return FakeBatch(self.max_messages)
+
+    def send_messages(self, batch: FakeBatch) -> None:
+        self.batches.append(batch)
+
+
+class FakeClientContext:
+    """A context manager that returns a fake Service Bus client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __enter__(self):
+        """Enter the context."""
+        return self.client
+
+    def __exit__(self, *args):
+        """Exit the context."""
+        return False
+
+
+@pytest.fixture
+def container_client() -> FakeContainerClient:
+    return FakeContainerClient()
+
+
+@given(parsers.re(r'an archive with the path format "(?P<path_format>[^"]*)"'), target_fixture='load_uri')
+def _(path_format: str, container_client: FakeContainerClient, monkeypatch: pytest.MonkeyPatch):
+    """an archive with the path format <path_format>."""
+    service_client = types.SimpleNamespace(get_container_client=lambda container_name: container_client)
+    monkeypatch.setattr(
+        archive_reader.azure.storage.blob.BlobServiceClient,
+        'from_connection_string',
+        lambda connection_string: service_client
+    )
+    return SBT2Blob.LoadURI('mycontainer', 'topics', 'mytopic', path_format)
+
+
+@given(parsers.parse('the archive codec is {codec}'))
+def _(codec: str, load_uri: SBT2Blob.LoadURI):
+    """the archive codec is <codec>."""
+    load_uri.codec = codec
+
+
+@given(parsers.parse('the archive has {blob_count:d} blobs listed in reverse order'))
+def _(blob_count: int, load_uri: SBT2Blob.LoadURI, container_client: FakeContainerClient):
+    """the archive has <blob_count> blobs listed in reverse order."""
+    for offset in reversed(range(blob_count)):
+        blob_name = load_uri.uri(offset, START).removeprefix('azure://mycontainer/')
+        container_client.blobs[blob_name] = COMPRESSORS[load_uri.codec](f'{offset}-a\n{offset}-b\n'.encode())
+
+
+@when(parsers.parse('the archive is read with {max_workers:d} workers'), target_fixture='reader')
+def _(max_workers: int, load_uri: SBT2Blob.LoadURI):
+    """the archive is read with <max_workers> workers."""
+    return archive_reader.ArchiveReader('', load_uri, START, START + datetime.timedelta(days=1), max_workers)
+
+
+@when(parsers.parse('the archive is read from {start} to {end}'), target_fixture='reader')
+def _(start: str, end: str, load_uri: SBT2Blob.LoadURI):
+    """the archive is read from <start> to <end>."""
+    start = datetime.datetime.fromisoformat(start)
+    end = datetime.datetime.fromisoformat(end)
+    return archive_reader.ArchiveReader('', load_uri, start, end, 1)
+
+
+@given(parsers.parse('the archived line {line}'), target_fixture='line')
+def _(line: str):
+    """the archived line <line>."""
+    return line.encode()
+
+
+@given(parsers.parse('a topic that accepts batches of {max_messages:d} messages'), target_fixture='sender')
+def _(max_messages: int, monkeypatch: pytest.MonkeyPatch):
+    """a topic that accepts batches of <max_messages> messages."""
+    sender = FakeSender(max_messages)
+    client = types.SimpleNamespace(get_topic_sender=lambda topic_name: sender)
+    monkeypatch.setattr(
+        archive_reader.ServiceBusClient,
+        'from_connection_string',
+        lambda connection_string: FakeClientContext(client)
+    )
+    return sender
+
+
+@when(parsers.parse('the line is converted to a message with the {output_format} format'), target_fixture='message')
+def _(output_format: str, line: bytes):
+    """the line is converted to a message with the <output_format> format."""
+    return archive_reader.to_message(line, output_format)
+
+
+@when(parsers.parse('{line_count:d} archived lines are published'), target_fixture='published_count')
+def _(line_count: int):
+    """<line_count> archived lines are published."""
+    lines = (str(number).encode() for number in range(line_count))
+    return archive_reader.publish('', 'mytopic', lines, 'text')
+
+
+@then('creating the archive reader raises a ValueError')
+def _(load_uri: SBT2Blob.LoadURI):
+    """creating the archive reader raises a ValueError."""
+    with pytest.raises(ValueError, match='does not contain a timestamp'):
+        archive_reader.ArchiveReader('', load_uri, START, START, 1)
+
+
+@then(parsers.parse('no more than {max_downloads:d} blobs are downloaded before the first message is read'),
+      target_fixture='messages')
+def _(max_downloads: int, reader):
+    """no more than <max_downloads> blobs are downloaded before the first message is read."""
+    messages = reader.messages()
+    first = next(messages)
+    assert reader.container_client.download_count <= max_downloads
+    return [first, *messages]
+
+
+@then('the messages are read in sequence order')
+def _(messages: list, reader):
+    """the messages are read in sequence order."""
+    expected = [f'{offset}-{part}'.encode() for offset in range(10) for part in 'ab']
+    assert messages == expected
+    assert reader.container_client.download_count == 10
+
+
+@then(parsers.parse('the time range is {expected_start} to {expected_end}'))
+def _(expected_start: str, expected_end: str, reader):
+    """the time range is <expected_start> to <expected_end>."""
+    assert reader.start.isoformat() == expected_start
+    assert reader.end.isoformat() == expected_end
+
+
+@then(parsers.parse('the message body is {body}'))
+def _(body: str, message):
+    """the message body is <body>."""
+    assert b''.join(message.body) == body.encode()
+
+
+@then(parsers.parse('the message subject is {subject}'))
+def _(subject: str, message):
+    """the message subject is <subject>."""
+    assert str(message.subject) == subject
+
+
+@then(parsers.parse('the message application property {key} is {value}'))
+def _(key: str, value: str, message):
+    """the message application property <key> is <value>."""
+    expected_value = bytes.fromhex(value[2:]) if value.startswith('0x') else value
+    assert message.application_properties[key] == expected_value
+
+
+@then(parsers.parse('{count:d} messages are published in batches of {batch_sizes}'))
+def _(count: int, batch_sizes: str, published_count: int, sender: FakeSender):
+    """<count> messages are published in batches of <batch_sizes>."""
+    assert published_count == count
+    assert ','.join(str(len(batch)) for batch in sender.batches) == batch_sizes
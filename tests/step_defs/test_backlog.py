@@ -0,0 +1,155 @@
+"""Backlog feature tests."""
+import math
+import threading
+import time
+import types
+
+from azure.core.exceptions import ResourceNotFoundError
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('backlog.feature', 'Poll Message Counts')
+def test_poll_message_counts():
+    """Poll Message Counts."""
+
+
+@scenario('backlog.feature', 'Connection String Not Set')
+def test_connection_string_not_set():
+    """Connection String Not Set."""
+
+
+@scenario('backlog.feature', 'Retry After A Failed Connection')
+def test_retry_after_a_failed_connection():
+    """Retry After A Failed Connection."""
+
+
+class FakeAdministrationClient:
+    def __init__(self, missing_topic_name: str = None):
+        self.missing_topic_name = missing_topic_name
+
+    def __enter__(self):
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args):
+        """Exit the context."""
+        return False
+
+    def get_subscription_runtime_properties(self, topic_name: str, subscription_name: str):
+        if topic_name == self.missing_topic_name:
+            raise ResourceNotFoundError(f'{topic_name} not found.')
+
+        return types.SimpleNamespace(active_message_count=42, dead_letter_message_count=3)
+
+
+@given(parsers.parse('a backlog monitor for {first} and {second}'), target_fixture='backlog_monitor')
+def _(first: str, second: str):
+    """a backlog monitor for <first> and <second>."""
+    return SBT2Blob.BacklogMonitor('', [tuple(first.split(':')), tuple(second.split(':'))])
+
+
+class FakeAdministrationModule:
+    """A module whose client fails to connect a number of times before connecting."""
+
+    def __init__(self, failure_count: int):
+        self.failure_count = failure_count
+        self.attempt_count = 0
+        self.ServiceBusAdministrationClient = types.SimpleNamespace(from_connection_string=self.from_connection_string)
+
+    def from_connection_string(self, connection_string: str) -> FakeAdministrationClient:
+        self.attempt_count += 1
+
+        if self.attempt_count <= self.failure_count:
+            raise RuntimeError('Unable to connect.')
+
+        return FakeAdministrationClient()
+
+
+@given(parsers.parse('a backlog monitor for {topic_and_subscription} with the connection string {connection_string}'),
+       target_fixture='backlog_monitor')
+def _(topic_and_subscription: str, connection_string: str):
+    """a backlog monitor for <topic_and_subscription> with the connection string <connection_string>."""
+    connection_string = None if connection_string == 'None' else connection_string
+    return SBT2Blob.BacklogMonitor(connection_string, [tuple(topic_and_subscription.split(':'))], 0.01)
+
+
+@given(parsers.parse('an administration client that fails to connect {failure_count:d} times'),
+       target_fixture='module')
+def _(failure_count: int, monkeypatch):
+    """an administration client that fails to connect <failure_count> times."""
+    module = FakeAdministrationModule(failure_count)
+    monkeypatch.setattr(SBT2Blob, 'lazy_import', lambda name: module)
+    return module
+
+
+@given(parsers.parse('an administration client that is unable to find {topic_name}'), target_fixture='client')
+def _(topic_name: str):
+    """an administration client that is unable to find <topic_name>."""
+    return FakeAdministrationClient(topic_name)
+
+
+@when('the backlog is polled', target_fixture='poll_result')
+def _(backlog_monitor: SBT2Blob.BacklogMonitor, client: FakeAdministrationClient):
+    """the backlog is polled."""
+    return backlog_monitor.poll(client)
+
+
+@when('the backlog monitor runs until the counts are polled')
+def _(backlog_monitor: SBT2Blob.BacklogMonitor):
+    """the backlog monitor runs until the counts are polled."""
+    thread = threading.Thread(target=backlog_monitor.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+
+    while not backlog_monitor.counts and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    backlog_monitor.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+@when(parsers.parse('the backlog monitor runs for {run_seconds:f} seconds'), target_fixture='was_running')
+def _(run_seconds: float, backlog_monitor: SBT2Blob.BacklogMonitor):
+    """the backlog monitor runs for <run_seconds> seconds."""
+    thread = threading.Thread(target=backlog_monitor.run, daemon=True)
+    thread.start()
+    time.sleep(run_seconds)
+    was_running = thread.is_alive()
+    backlog_monitor.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    return was_running
+
+
+@then('the backlog monitor was still running')
+def _(was_running: bool):
+    """the backlog monitor was still running."""
+    assert was_running
+
+
+@then(parsers.parse('the connection was attempted {expected_attempts:d} times'))
+def _(expected_attempts: int, module: FakeAdministrationModule):
+    """the connection was attempted <expected_attempts> times."""
+    assert module.attempt_count == expected_attempts
+
+
+@then(parsers.parse('the poll result is {expected_result}'))
+def _(expected_result: str, poll_result: bool):
+    """the poll result is <expected_result>."""
+    assert str(poll_result) == expected_result
+
+
+@then(parsers.parse('the {kind} message count of {topic_name}:{subscription_name} is {expected_count:g}'))
+def _(kind: str, topic_name: str, subscription_name: str, expected_count: float,
+      backlog_monitor: SBT2Blob.BacklogMonitor):
+    """the <kind> message count of <topic_name>:<subscription_name> is <expected_count>."""
+    kind = kind.replace('-', '_')
+    actual_count = backlog_monitor.message_count(topic_name, subscription_name, kind)
+
+    if math.isnan(expected_count):
+        assert math.isnan(actual_count)
+    else:
+        assert actual_count == expected_count
@@ -0,0 +1,62 @@
+"""Duplicates feature tests."""
+import types
+
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('duplicates.feature', 'Filter Duplicates')
+def test_filter_duplicates():
+    """Filter Duplicates."""
+
+
+def to_messages(numbers: str, delivery_count: int = 0) -> list:
+    """Create messages from comma separated numbers and (inclusive) ranges of numbers."""
+    response = []
+
+    for item in numbers.split(','):
+        start, _, end = item.partition('-')
+
+        for number in range(int(start), int(end or start) + 1):
+            response.append(types.SimpleNamespace(
+                sequence_number=number, message_id=str(number), delivery_count=delivery_count
+            ))
+
+    return response
+
+
+class RecordingCounter:
+    def __init__(self):
+        self.increments = []
+
+    def inc(self, amount: float = 1) -> None:
+        self.increments.append(amount)
+
+
+@given(parsers.parse('a {duplicate_filter} filter with a window of {window:d}'), target_fixture='duplicate_filter')
+def _(duplicate_filter: str, window: int, monkeypatch):
+    """a <duplicate_filter> filter with a window of <window>."""
+    monkeypatch.setitem(SBT2Blob.COUNTERS, 'duplicate_messages', RecordingCounter())
+    return SBT2Blob.DUPLICATE_FILTERS[duplicate_filter](window)
+
+
+@when(parsers.parse('the messages {archived} are remembered'))
+def _(archived: str, duplicate_filter: SBT2Blob.DuplicateFilter):
+    """the messages <archived> are remembered."""
+    duplicate_filter.remember(to_messages(archived))
+
+
+@then(parsers.parse(
+    'the unseen messages of {received} with a delivery count of {delivery_count:d} are {expected_unseen}'
+))
+def _(received: str, delivery_count: int, expected_unseen: str, duplicate_filter: SBT2Blob.DuplicateFilter):
+    """the unseen messages of <received> with a delivery count of <delivery_count> are <expected_unseen>."""
+    unseen = duplicate_filter.unseen(to_messages(received, delivery_count))
+    assert ','.join(message.message_id for message in unseen) == expected_unseen
+
+
+@then(parsers.parse('the duplicate count is {expected_count:d}'))
+def _(expected_count: int):
+    """the duplicate count is <expected_count>."""
+    assert sum(SBT2Blob.COUNTERS['duplicate_messages'].increments) == expected_count
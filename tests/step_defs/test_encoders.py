@@ -0,0 +1,142 @@
+"""Encoders feature tests."""
+import ast
+import decimal
+import json
+import uuid
+
+import pytest
+from azure.servicebus import ServiceBusMessage
+from azure.servicebus.amqp import AmqpAnnotatedMessage
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('encoders.feature', 'Envelope Body')
+def test_envelope_body():
+    """Envelope Body."""
+
+
+@scenario('encoders.feature', 'Envelope Body Types')
+def test_envelope_body_types():
+    """Envelope Body Types."""
+
+
+@scenario('encoders.feature', 'Envelope Properties')
+def test_envelope_properties():
+    """Envelope Properties."""
+
+
+@scenario('encoders.feature', 'Envelope Application Property Types')
+def test_envelope_application_property_types():
+    """Envelope Application Property Types."""
+
+
+@scenario('encoders.feature', 'Text Encoder')
+def test_text_encoder():
+    """Text Encoder."""
+
+
+@given(parsers.parse('a message with the body {body}'), target_fixture='message')
+def _(body: str):
+    """a message with the body <body>."""
+    if body.startswith('0x'):
+        body = bytes.fromhex(body[2:])
+    else:
+        body = body.encode()
+
+    return ServiceBusMessage(
+        body=body,
+        application_properties={'colour': 'blue'},
+        correlation_id='my-correlation-id',
+        message_id='42'
+    )
+
+
+@given(parsers.parse('a received message with the {body_type} body {body}'), target_fixture='message')
+def _(body_type: str, body: str):
+    """a received message with the <body_type> body <body>."""
+    body = bytes.fromhex(body[2:]) if body.startswith('0x') else ast.literal_eval(body)
+    message = ServiceBusMessage(b'')
+    message._raw_amqp_message = AmqpAnnotatedMessage(**{f'{body_type}_body': body})
+    return message
+
+
+@given(parsers.parse('the application property {key} is the {value_type} {value}'))
+def _(key: str, value_type: str, value: str, message: ServiceBusMessage):
+    """the application property <key> is the <value_type> <value>."""
+    if value_type == 'uuid':
+        value = uuid.UUID(value)
+    elif value_type == 'decimal':
+        value = decimal.Decimal(value)
+    elif value.startswith('0x'):
+        value = bytes.fromhex(value[2:])
+    else:
+        value = value.encode()
+
+    message.application_properties[key] = value
+
+
+@given(parsers.parse('the JSON library is {library}'))
+def _(library: str, monkeypatch: pytest.MonkeyPatch):
+    """the JSON library is <library>."""
+    if library == 'json':
+        monkeypatch.setattr(SBT2Blob, 'orjson', None)
+
+
+@when('the message is encoded with the envelope encoder', target_fixture='envelope')
+def _(message: ServiceBusMessage):
+    """the message is encoded with the envelope encoder."""
+    data = SBT2Blob.EnvelopeEncoder().encode([message, message])
+    lines = data.split(b'\n')
+    assert len(lines) == 3
+    assert lines[-1] == b''
+    return json.loads(lines[0])
+
+
+@when('the message is encoded with the text encoder', target_fixture='data')
+def _(message: ServiceBusMessage):
+    """the message is encoded with the text encoder."""
+    return SBT2Blob.TextEncoder().encode([message])
+
+
+@then(parsers.parse('the envelope body is {expected_body}'))
+def _(expected_body: str, envelope: dict):
+    """the envelope body is <expected_body>."""
+    assert envelope['body'] == expected_body
+
+
+@then(parsers.parse('the envelope body JSON is {expected_body}'))
+def _(expected_body: str, envelope: dict):
+    """the envelope body JSON is <expected_body>."""
+    assert json.dumps(envelope['body'], separators=(',', ':')) == expected_body
+
+
+@then(parsers.parse('the envelope body encoding is {body_encoding}'))
+def _(body_encoding: str, envelope: dict):
+    """the envelope body encoding is <body_encoding>."""
+    assert str(envelope.get('body_encoding')) == body_encoding
+
+
+@then(parsers.parse('the envelope field {key} is {value}'))
+def _(key: str, value: str, envelope: dict):
+    """the envelope field <key> is <value>."""
+    assert envelope[key] == value, envelope
+
+
+@then(parsers.parse('the envelope application property {key} is {value}'))
+def _(key: str, value: str, envelope: dict):
+    """the envelope application property <key> is <value>."""
+    assert envelope['application_properties'][key] == value, envelope
+
+
+@then(parsers.parse('the envelope encoding of the application property {key} is {encoding}'))
+def _(key: str, encoding: str, envelope: dict):
+    """the envelope encoding of the application property <key> is <encoding>."""
+    assert str(envelope.get('application_property_encodings', {}).get(key)) == encoding, envelope
+
+
+@then(parsers.parse('the encoded data is {expected_data}'))
+def _(expected_data: str, data: bytes):
+    """the encoded data is <expected_data>."""
+    assert data == f'{expected_data}\n'.encode()
@@ -0,0 +1,79 @@
+"""Multi-Topic Entrypoint feature tests."""
+import importlib.util
+import os
+
+import pytest
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+ENTRYPOINT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'multi-topic-entrypoint.py')
+spec = importlib.util.spec_from_file_location('multi_topic_entrypoint', ENTRYPOINT_PATH)
+entrypoint = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(entrypoint)
+
+
+@scenario('entrypoint.feature', 'No Topics Configured')
+def test_no_topics_configured():
+    """No Topics Configured."""
+
+
+@scenario('entrypoint.feature', 'Probes')
+def test_probes():
+    """Probes."""
+
+
+def metrics_app(environ: dict, start_response) -> list[bytes]:
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'metrics\n']
+
+
+@given(parsers.parse('an archivist that is {state}'), target_fixture='archivist')
+def _(state: str):
+    """an archivist that is <state>."""
+    archivist = entrypoint.Archivist.__new__(entrypoint.Archivist)
+    archivist._is_running = state != 'stopped'
+    archivist.shutdown = SBT2Blob.Shutdown()
+    archivist.metrics_app = metrics_app
+
+    if state == 'stopping':
+        archivist.shutdown.request()
+
+    return archivist
+
+
+@when(parsers.parse('the path {path} is requested'), target_fixture='response')
+def _(path: str, archivist):
+    """the path <path> is requested."""
+    response = {}
+
+    def start_response(status: str, headers: list) -> None:
+        response['status'] = status
+
+    response['body'] = b''.join(archivist.app({'PATH_INFO': path}, start_response))
+    return response
+
+
+@given('no topics and subscriptions are configured', target_fixture='topics_and_subscriptions')
+def _():
+    """no topics and subscriptions are configured."""
+    return ''
+
+
+@then('creating the archivist raises a ValueError')
+def _(topics_and_subscriptions: str):
+    """creating the archivist raises a ValueError."""
+    with pytest.raises(ValueError, match='No topics to archive'):
+        entrypoint.Archivist(topics_and_subscriptions, None)
+
+
+@then(parsers.parse('the response status is {expected_status}'))
+def _(expected_status: str, response: dict):
+    """the response status is <expected_status>."""
+    assert response['status'] == expected_status
+
+
+@then(parsers.parse('the response body is {expected_body}'))
+def _(expected_body: str, response: dict):
+    """the response body is <expected_body>."""
+    assert response['body'] == f'{expected_body}\n'.encode()
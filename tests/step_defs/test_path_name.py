@@ -11,6 +11,12 @@ def test_path_name():
     """Path Name."""
 
 
+@given(parsers.parse('the codec is {codec}'), target_fixture='codec')
+def _(codec: str):
+    """the codec is <codec>."""
+    return codec
+
+
 @given(parsers.parse('the container name is {container_name}'), target_fixture='container_name')
 def _(container_name: str):
     """the container name is <container_name>."""
@@ -29,6 +35,18 @@ def _(path_format: str):
     return path_format
 
 
+@given(parsers.parse('the session ID is {session_id}'), target_fixture='session_id')
+def _(session_id: str):
+    """the session ID is <session_id>."""
+    return session_id
+
+
+@given(parsers.parse('the sub-directory is {sub_directory}'), target_fixture='sub_directory')
+def _(sub_directory: str):
+    """the sub-directory is <sub_directory>."""
+    return sub_directory
+
+
 @given(parsers.parse('the timestamp is {timestamp}'), target_fixture='timestamp')
 def _(timestamp: str):
     """the timestampe is <timestamp>."""
@@ -48,18 +66,66 @@ def _(topics_dir: str):
 
 
 @when('the load URI is created', target_fixture='load_uri')
-def _(container_name: str, topics_directory: str, topic_name: str, path_format: str):
+def _(container_name: str, topics_directory: str, topic_name: str, path_format: str, request):
     """the load URI is created."""
+    sub_directory = request.getfixturevalue('sub_directory') if 'sub_directory' in request.fixturenames else ''
+    codec = request.getfixturevalue('codec') if 'codec' in request.fixturenames else 'gzip'
     return LoadURI(
         container_name,
         topics_directory,
         topic_name,
-        path_format
+        path_format,
+        sub_directory,
+        codec
     )
 
 
 @then(parsers.parse('the path is {expected_uri}'))
-def _(expected_uri: str, load_uri: LoadURI, timestamp: datetime.datetime, offset: int):
+def _(expected_uri: str, load_uri: LoadURI, timestamp: datetime.datetime, offset: int, request):
     """the path is <uri>."""
-    actual_uri = load_uri.uri(offset, timestamp)
+    session_id = request.getfixturevalue('session_id') if 'session_id' in request.fixturenames else None
+    actual_uri = load_uri.uri(offset, timestamp, session_id)
     assert actual_uri == expected_uri
+
+
+@scenario('path_name.feature', 'Session Path Name')
+def test_session_path_name():
+    """Session Path Name."""
+
+
+@scenario('path_name.feature', 'Dead-Letter Path Name')
+def test_dead_letter_path_name():
+    """Dead-Letter Path Name."""
+
+
+@scenario('path_name.feature', 'Codec Path Name')
+def test_codec_path_name():
+    """Codec Path Name."""
+
+
+@scenario('path_name.feature', 'Parse Blob Name')
+def test_parse_blob_name():
+    """Parse Blob Name."""
+
+
+@scenario('path_name.feature', 'List Prefixes')
+def test_list_prefixes():
+    """List Prefixes."""
+
+
+@then(parsers.parse('the blob name {blob_name} has the offset {offset} and the timestamp {timestamp}'))
+def _(blob_name: str, offset: str, timestamp: str, load_uri: LoadURI):
+    """the blob name <blob_name> has the offset <offset> and the timestamp <timestamp>."""
+    expected_offset = None if offset == 'None' else int(offset)
+    expected_timestamp = None if timestamp == 'None' else datetime.datetime.fromisoformat(timestamp)
+    assert load_uri.parse(blob_name) == (expected_offset, expected_timestamp)
+
+
+@then(parsers.parse('the prefixes from {start} to {end} start with {prefixes}'))
+def _(start: str, end: str, prefixes: str, load_uri: LoadURI):
+    """the prefixes from <start> to <end> start with <prefixes>."""
+    expected_prefixes = prefixes.split(',')
+    start = datetime.datetime.fromisoformat(start)
+    end = datetime.datetime.fromisoformat(end)
+    actual_prefixes = load_uri.prefixes(start, end)
+    assert actual_prefixes[:len(expected_prefixes)] == expected_prefixes, actual_prefixes
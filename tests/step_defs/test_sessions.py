@@ -0,0 +1,258 @@
+"""Sessions feature tests."""
+import collections
+import threading
+import time
+import types
+
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('sessions.feature', 'Drain Sessions')
+def test_drain_sessions():
+    """Drain Sessions."""
+
+
+@scenario('sessions.feature', 'Keep A Shared Connection Open')
+def test_keep_a_shared_connection_open():
+    """Keep A Shared Connection Open."""
+
+
+@scenario('sessions.feature', 'Recover Concurrency')
+def test_recover_concurrency():
+    """Recover Concurrency."""
+
+
+@scenario('sessions.feature', 'Register Session Lock Once')
+def test_register_session_lock_once():
+    """Register Session Lock Once."""
+
+
+class FakeRenewer:
+    def __init__(self):
+        self.registered = []
+
+    def register(self, receiver, renewable, max_lock_renewal_duration: float) -> None:
+        self.registered.append(renewable)
+
+
+class FakeConnection:
+    """A client or renewer that records being closed."""
+
+    def __init__(self):
+        self.is_closed = False
+
+    def __enter__(self):
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the connection."""
+        self.close()
+        return False
+
+    def close(self) -> None:
+        self.is_closed = True
+
+    def get_subscription_receiver(self, *args, **kwargs) -> 'FakeConnection':
+        return FakeConnection()
+
+
+class FakeLoader:
+    def __init__(self, config: SBT2Blob.TopicConfig, load_seconds: float):
+        self.config = config
+        self.duplicate_filter = None
+        self.load_seconds = load_seconds
+
+    def load(self, messages: list, session_id: str = None) -> None:
+        if messages:
+            time.sleep(self.load_seconds)
+
+
+class FakeExtractor:
+    """An extractor for a session, or one that finds no session available if session_id is None."""
+
+    def __init__(self, config: SBT2Blob.TopicConfig, session_id: str, message_count: int):
+        self.config = config
+        self.topic_name = config.topic_name
+        self.finished = False
+        self.lock_deadline = None
+        self.no_session_available = False
+        self.session_id = session_id
+        self.messages = [types.SimpleNamespace(session_id=session_id) for _ in range(message_count)]
+
+    def accept_messages(self, messages: list) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def get_messages(self) -> list:
+        if self.session_id is None:
+            self.finished = self.no_session_available = True
+
+        messages, self.messages = self.messages, []
+        self.finished = self.finished or not messages
+        return messages
+
+    def session(self) -> str:
+        # Like the SDK, the session ID is left as NEXT_AVAILABLE_SESSION if no session was accepted.
+        return self.session_id or SBT2Blob.NEXT_AVAILABLE_SESSION
+
+
+class FakeExtractorFactory:
+    def __init__(self, config: SBT2Blob.TopicConfig, session_ids: list, message_count: int):
+        self.config = config
+        self.session_ids = collections.deque(session_ids)
+        self.message_count = message_count
+        self.accepted = []
+        self.accepting_threads = set()
+        self.load_seconds = 0.0
+        self.call_count = 0
+        self.connections = []
+        self.used_connections = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, client: FakeConnection, renewer: FakeConnection) -> FakeExtractor:
+        with self._lock:
+            self.used_connections.update([client, renewer])
+            self.call_count += 1
+            assert self.call_count < 100, 'The workers did not stop when no session was available.'
+            session_id = self.session_ids.popleft() if self.session_ids else None
+
+            if session_id is not None:
+                self.accepted.append(session_id)
+                self.accepting_threads.add(threading.current_thread().name)
+
+        return FakeExtractor(self.config, session_id, self.message_count if session_id else 0)
+
+    def connect(self) -> tuple[FakeConnection, FakeConnection]:
+        connection = FakeConnection(), FakeConnection()
+
+        with self._lock:
+            self.connections.extend(connection)
+
+        return connection
+
+
+@given(parsers.parse('the sessions {sessions} with {message_count:d} messages each'), target_fixture='factory')
+def _(sessions: str, message_count: int):
+    """the sessions <sessions> with <message_count> messages each."""
+    config = SBT2Blob.TopicConfig('mytopic', 'test', container_name='mycontainer')
+    session_ids = [] if sessions == 'none' else sessions.split(',')
+    return FakeExtractorFactory(config, session_ids, message_count)
+
+
+@given(parsers.parse('the throttle scale is {scale:f}'))
+def _(scale: float, monkeypatch):
+    """the throttle scale is <scale>."""
+    throttle = SBT2Blob.Throttle()
+    throttle.scale = scale
+    monkeypatch.setattr(SBT2Blob, 'THROTTLE', throttle)
+
+
+@given(parsers.parse('each load takes {load_seconds:f} seconds'))
+def _(load_seconds: float, factory: FakeExtractorFactory):
+    """each load takes <load_seconds> seconds."""
+    factory.load_seconds = load_seconds
+
+
+@given('a session extractor', target_fixture='extractor')
+def _():
+    """a session extractor."""
+    config = SBT2Blob.TopicConfig('mytopic', 'test', container_name='mycontainer')
+    extractor = SBT2Blob.Extractor(
+        'Endpoint=sb://localhost/;SharedAccessKeyName=a;SharedAccessKey=b',
+        config,
+        session_id=SBT2Blob.NEXT_AVAILABLE_SESSION
+    )
+    extractor.receiver = types.SimpleNamespace(session=types.SimpleNamespace(session_id='a'))
+    extractor.renewer = FakeRenewer()
+    return extractor
+
+
+@given('a session extractor on a shared connection', target_fixture='extractor')
+def _():
+    """a session extractor on a shared connection."""
+    config = SBT2Blob.TopicConfig('mytopic', 'test', container_name='mycontainer')
+    return SBT2Blob.Extractor(
+        '',
+        config,
+        session_id=SBT2Blob.NEXT_AVAILABLE_SESSION,
+        client=FakeConnection(),
+        renewer=FakeConnection()
+    )
+
+
+@when('the extractor is closed')
+def _(extractor: SBT2Blob.Extractor):
+    """the extractor is closed."""
+    extractor.close()
+
+
+@when(parsers.parse('{batch_count:d} batches of messages are received from the session'))
+def _(batch_count: int, extractor: SBT2Blob.Extractor):
+    """<batch_count> batches of messages are received from the session."""
+    for _ in range(batch_count):
+        extractor.register_locks([types.SimpleNamespace(session_id='a')])
+
+
+@when(parsers.parse('the sessions are drained by {max_concurrent_sessions:d} workers'), target_fixture='loaded_count')
+def _(max_concurrent_sessions: int, factory: FakeExtractorFactory):
+    """the sessions are drained by <max_concurrent_sessions> workers."""
+    loader = FakeLoader(factory.config, factory.load_seconds)
+    return SBT2Blob.drain_sessions(
+        max_concurrent_sessions,
+        factory.connect,
+        factory,
+        loader,
+        time.monotonic(),
+        SBT2Blob.Shutdown()
+    )
+
+
+@then(parsers.parse('the number of messages loaded is {expected_count:d}'))
+def _(expected_count: int, loaded_count: int):
+    """the number of messages loaded is <expected_count>."""
+    assert loaded_count == expected_count
+
+
+@then(parsers.parse('the session lock is registered {expected_count:d} time'))
+def _(expected_count: int, extractor: SBT2Blob.Extractor):
+    """the session lock is registered <expected_count> time."""
+    assert len(extractor.renewer.registered) == expected_count
+
+
+@then('the sessions are accepted by more than 1 worker')
+def _(factory: FakeExtractorFactory):
+    """the sessions are accepted by more than 1 worker."""
+    assert len(factory.accepting_threads) > 1
+
+
+@then('every session is accepted once')
+def _(factory: FakeExtractorFactory):
+    """every session is accepted once."""
+    assert not factory.session_ids
+    assert len(factory.accepted) == len(set(factory.accepted))
+
+
+@then(parsers.parse('each of the {max_concurrent_sessions:d} workers opens and closes 1 connection'))
+def _(max_concurrent_sessions: int, factory: FakeExtractorFactory):
+    """each of the <max_concurrent_sessions> workers opens and closes 1 connection."""
+    assert len(factory.connections) == max_concurrent_sessions * 2
+    assert factory.used_connections <= set(factory.connections)
+    assert all(connection.is_closed for connection in factory.connections)
+
+
+@then('the receiver is closed')
+def _(extractor: SBT2Blob.Extractor):
+    """the receiver is closed."""
+    assert extractor.receiver.is_closed
+
+
+@then('the shared connection is open')
+def _(extractor: SBT2Blob.Extractor):
+    """the shared connection is open."""
+    assert not extractor.client.is_closed
+    assert not extractor.renewer.is_closed
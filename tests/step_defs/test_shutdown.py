@@ -0,0 +1,130 @@
+"""Shutdown feature tests."""
+import time
+import types
+
+import pytest
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('shutdown.feature', 'Load Before Deadline')
+def test_load_before_deadline():
+    """Load Before Deadline."""
+
+
+@scenario('shutdown.feature', 'Shutdown Not Requested')
+def test_shutdown_not_requested():
+    """Shutdown Not Requested."""
+
+
+@scenario('shutdown.feature', 'Close The Extractor After An Unexpected Error')
+def test_close_the_extractor_after_an_unexpected_error():
+    """Close The Extractor After An Unexpected Error."""
+
+
+class FakeExtractor:
+    """An extractor that receives one message and records being closed."""
+
+    def __init__(self):
+        self.config = types.SimpleNamespace(max_runtime_seconds=0)
+        self.finished = False
+        self.is_closed = False
+        self.lock_deadline = None
+        self.topic_name = 'mytopic'
+
+    def close(self) -> None:
+        self.is_closed = True
+
+    def get_messages(self) -> list:
+        return [types.SimpleNamespace(message_id='1')]
+
+    def session(self) -> str:
+        return None
+
+
+class FailingLoader:
+    duplicate_filter = None
+
+    def load(self, messages: list, session_id: str = None) -> None:
+        raise TypeError('Type is not JSON serializable: generator')
+
+
+class SlowLoader:
+    def __init__(self, upload_seconds: float):
+        self.upload_seconds = upload_seconds
+
+    def load(self, messages: list, session_id: str = None) -> None:
+        time.sleep(self.upload_seconds)
+
+
+@given(parsers.parse('a loader that takes {upload_seconds:f} seconds to upload'), target_fixture='loader')
+def _(upload_seconds: float):
+    """a loader that takes <upload_seconds> seconds to upload."""
+    return SlowLoader(upload_seconds)
+
+
+@given('a loader that fails with a TypeError', target_fixture='loader')
+def _():
+    """a loader that fails with a TypeError."""
+    return FailingLoader()
+
+
+@given(parsers.parse('a shutdown with a timeout of {timeout_seconds:f} seconds'), target_fixture='shutdown')
+def _(timeout_seconds: float):
+    """a shutdown with a timeout of <timeout_seconds> seconds."""
+    return SBT2Blob.Shutdown(timeout_seconds)
+
+
+@when('a shutdown is requested')
+def _(shutdown: SBT2Blob.Shutdown):
+    """a shutdown is requested."""
+    shutdown.request()
+
+
+@when('the messages are loaded before the deadline', target_fixture='load_result')
+def _(loader: SlowLoader, shutdown: SBT2Blob.Shutdown):
+    """the messages are loaded before the deadline."""
+    return SBT2Blob.load_before_deadline(loader, [], None, shutdown)
+
+
+@then(parsers.parse('the load result is {expected_result}'))
+def _(expected_result: str, load_result: bool):
+    """the load result is <expected_result>."""
+    assert str(load_result) == expected_result
+
+
+@then('the shutdown is not requested')
+def _(shutdown: SBT2Blob.Shutdown):
+    """the shutdown is not requested."""
+    assert not shutdown.is_requested()
+
+
+@then('the time remaining is None')
+def _(shutdown: SBT2Blob.Shutdown):
+    """the time remaining is None."""
+    assert shutdown.remaining() is None
+
+
+@when('the extractor is drained', target_fixture='extractor')
+def _(loader: FailingLoader):
+    """the extractor is drained."""
+    extractor = FakeExtractor()
+
+    with pytest.raises(TypeError) as exc_info:
+        SBT2Blob.drain(extractor, loader, time.monotonic(), SBT2Blob.Shutdown())
+
+    extractor.error = exc_info.value
+    return extractor
+
+
+@then('the TypeError is raised')
+def _(extractor: FakeExtractor):
+    """the TypeError is raised."""
+    assert isinstance(extractor.error, TypeError)
+
+
+@then('the extractor is closed')
+def _(extractor: FakeExtractor):
+    """the extractor is closed."""
+    assert extractor.is_closed
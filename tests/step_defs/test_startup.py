@@ -0,0 +1,103 @@
+"""Start Up feature tests."""
+import math
+import sys
+import time
+
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('startup.feature', 'Lazy Import During Prewarm')
+def test_lazy_import_during_prewarm():
+    """Lazy Import During Prewarm."""
+
+
+@scenario('startup.feature', 'First Message')
+def test_first_message():
+    """First Message."""
+
+
+@scenario('startup.feature', 'Process Uptime')
+def test_process_uptime():
+    """Process Uptime."""
+
+
+@given(parsers.parse('a module that takes {import_seconds:f} seconds to import'), target_fixture='module_name')
+def _(import_seconds: float, tmp_path, monkeypatch):
+    """a module that takes <import_seconds> seconds to import."""
+    module_name = 'slow_module_for_lazy_import'
+    source = f'import time\ntime.sleep({import_seconds})\n\n\ndef open():\n    pass\n'
+    (tmp_path / f'{module_name}.py').write_text(source)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, module_name, raising=False)
+    monkeypatch.setattr(SBT2Blob, '_import_seconds', {})
+    return module_name
+
+
+@given('no message has been archived')
+def _(monkeypatch):
+    """no message has been archived."""
+    monkeypatch.setattr(SBT2Blob, '_first_message_seconds', None)
+
+
+@when('the module is prewarmed')
+def _(module_name: str):
+    """the module is prewarmed."""
+    SBT2Blob.prewarm_imports(module_name)
+
+    # Wait for the import to start on the background thread.
+    while module_name not in sys.modules:
+        time.sleep(0.01)
+
+
+@when('the module is imported lazily', target_fixture='module')
+def _(module_name: str):
+    """the module is imported lazily."""
+    return SBT2Blob.lazy_import(module_name)
+
+
+@when(parsers.parse('a batch of {message_count:d} messages is archived'))
+def _(message_count: int):
+    """a batch of <message_count> messages is archived."""
+    SBT2Blob.record_first_message([object()] * message_count)
+
+
+@then('the module is fully initialised')
+def _(module):
+    """the module is fully initialised."""
+    assert hasattr(module, 'open')
+
+
+@then(parsers.parse('the import time is at least {import_seconds:f} seconds'))
+def _(import_seconds: float):
+    """the import time is at least <import_seconds> seconds."""
+    # Allow for the time between the prewarm thread starting the import and starting its timer.
+    assert SBT2Blob.import_seconds() >= import_seconds - 0.1
+
+
+@then('the first message seconds is NaN')
+def _():
+    """the first message seconds is NaN."""
+    assert math.isnan(SBT2Blob.first_message_seconds())
+
+
+@then('the first message seconds is the process uptime')
+def _():
+    """the first message seconds is the process uptime."""
+    assert 0 < SBT2Blob.first_message_seconds() <= SBT2Blob.process_uptime()
+
+
+@then('the first message seconds does not change on the next batch')
+def _():
+    """the first message seconds does not change on the next batch."""
+    first_message_seconds = SBT2Blob.first_message_seconds()
+    time.sleep(0.05)
+    SBT2Blob.record_first_message([object()])
+    assert SBT2Blob.first_message_seconds() == first_message_seconds
+
+
+@then('the process uptime is positive')
+def _():
+    """the process uptime is positive."""
+    assert SBT2Blob.process_uptime() > 0
@@ -0,0 +1,209 @@
+"""Throttle feature tests."""
+import time
+import types
+
+from azure.core.exceptions import HttpResponseError, ServiceRequestError
+from azure.servicebus.exceptions import (ServiceBusError,
+                                         ServiceBusServerBusyError)
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('throttle.feature', 'Back Off')
+def test_back_off():
+    """Back Off."""
+
+
+@scenario('throttle.feature', 'Recover Gradually')
+def test_recover_gradually():
+    """Recover Gradually."""
+
+
+@scenario('throttle.feature', 'Throttled Errors')
+def test_throttled_errors():
+    """Throttled Errors."""
+
+
+@scenario('throttle.feature', 'Transient Errors')
+def test_transient_errors():
+    """Transient Errors."""
+
+
+@scenario('throttle.feature', 'Back Off From A Failed Upload')
+def test_back_off_from_a_failed_upload():
+    """Back Off From A Failed Upload."""
+
+
+class RecordingCounter:
+    def __init__(self):
+        self.increments = []
+
+    def inc(self, amount: float = 1) -> None:
+        self.increments.append(amount)
+
+
+class FakeExtractor:
+    """An extractor that redelivers abandoned messages."""
+
+    def __init__(self, config: SBT2Blob.TopicConfig, message_count: int):
+        self.config = config
+        self.topic_name = config.topic_name
+        self.finished = False
+        self.messages = [types.SimpleNamespace(sequence_number=number) for number in range(message_count)]
+        self.abandon_count = 0
+        self.lock_deadline = None
+
+    def abandon_messages(self, messages: list) -> None:
+        self.abandon_count += 1
+        self.messages = messages + self.messages
+
+    def accept_messages(self, messages: list) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def get_messages(self) -> list:
+        messages, self.messages = self.messages, []
+        self.finished = not messages
+        self.lock_deadline = time.monotonic() + SBT2Blob.LOCK_RENEWAL_SECONDS
+        return messages
+
+    def session(self) -> str:
+        return None
+
+
+class FailingLoader:
+    def __init__(self, config: SBT2Blob.TopicConfig, failure_count: int, status_code: int):
+        self.config = config
+        self.duplicate_filter = None
+        self.failure_count = failure_count
+        self.status_code = status_code
+
+    def load(self, messages: list, session_id: str = None) -> None:
+        if messages and self.failure_count:
+            self.failure_count -= 1
+            response = types.SimpleNamespace(status_code=self.status_code, reason='Server Busy', headers={})
+            raise HttpResponseError(response=response)
+
+
+@given(parsers.parse('a throttle with a base of {base_seconds:f} seconds and a maximum of {max_seconds:f} seconds'),
+       target_fixture='throttle')
+def _(base_seconds: float, max_seconds: float):
+    """a throttle with a base of <base_seconds> seconds and a maximum of <max_seconds> seconds."""
+    return SBT2Blob.Throttle(base_seconds, max_seconds)
+
+
+@given(parsers.parse('an extractor with {message_count:d} messages'), target_fixture='extractor')
+def _(message_count: int, monkeypatch):
+    """an extractor with <message_count> messages."""
+    monkeypatch.setattr(SBT2Blob, 'THROTTLE', SBT2Blob.Throttle(0.0, 0.0))
+    monkeypatch.setitem(SBT2Blob.COUNTERS, 'backoff_seconds', RecordingCounter())
+    monkeypatch.setitem(SBT2Blob.COUNTERS, 'throttle_events', RecordingCounter())
+    config = SBT2Blob.TopicConfig('mytopic', 'test', container_name='mycontainer')
+    return FakeExtractor(config, message_count)
+
+
+@given(parsers.parse('a loader that fails {failure_count:d} times with the status code {status_code:d}'),
+       target_fixture='loader')
+def _(failure_count: int, status_code: int, extractor: FakeExtractor):
+    """a loader that fails <failure_count> times with the status code <status_code>."""
+    return FailingLoader(extractor.config, failure_count, status_code)
+
+
+@given(parsers.parse('the locks are renewed for {lock_renewal_seconds:d} seconds'))
+def _(lock_renewal_seconds: int, monkeypatch):
+    """the locks are renewed for <lock_renewal_seconds> seconds."""
+    monkeypatch.setattr(SBT2Blob, 'LOCK_RENEWAL_SECONDS', lock_renewal_seconds)
+
+
+@given(parsers.parse('the error is {error}'), target_fixture='error')
+def _(error: str):
+    """the error is <error>."""
+    if error.startswith('HttpResponseError'):
+        response = types.SimpleNamespace(status_code=int(error.split()[1]), reason='', headers={})
+        return HttpResponseError(response=response)
+
+    errors = {
+        'ServiceBusServerBusyError': ServiceBusServerBusyError,
+        'ServiceBusError': ServiceBusError,
+        'ServiceRequestError': ServiceRequestError
+    }
+    return errors[error](message='Throttled.')
+
+
+@when(parsers.parse('there are {error_count:d} errors that are throttled {is_throttled}'), target_fixture='backoff')
+def _(error_count: int, is_throttled: str, throttle: SBT2Blob.Throttle):
+    """there are <error_count> errors that are throttled <is_throttled>."""
+    for _ in range(error_count):
+        backoff = throttle.failure(is_throttled == 'True')
+
+    return backoff
+
+
+@when('the extractor is drained', target_fixture='loaded_count')
+def _(extractor: FakeExtractor, loader: FailingLoader):
+    """the extractor is drained."""
+    return SBT2Blob.drain(extractor, loader, time.monotonic(), SBT2Blob.Shutdown())
+
+
+@when(parsers.parse('there are {success_count:d} successes'))
+def _(success_count: int, throttle: SBT2Blob.Throttle):
+    """there are <success_count> successes."""
+    for _ in range(success_count):
+        throttle.success()
+
+
+@then(parsers.parse('the backoff is at most {max_backoff:f} seconds'))
+def _(max_backoff: float, backoff: float):
+    """the backoff is at most <max_backoff> seconds."""
+    assert 0 <= backoff <= max_backoff
+
+
+@then(parsers.parse('the error is throttled {is_throttled}'))
+def _(is_throttled: str, error: Exception):
+    """the error is throttled <is_throttled>."""
+    assert str(SBT2Blob.Throttle.is_throttled(error)) == is_throttled
+
+
+@then(parsers.parse('the error is transient {is_transient}'))
+def _(is_transient: str, error: Exception):
+    """the error is transient <is_transient>."""
+    assert str(SBT2Blob.Throttle.is_transient(error)) == is_transient
+
+
+@then(parsers.parse('the scaled batch size of {maximum:d} is {expected_batch_size:d}'))
+def _(maximum: int, expected_batch_size: int, throttle: SBT2Blob.Throttle):
+    """the scaled batch size of <maximum> is <expected_batch_size>."""
+    assert throttle.scaled(maximum) == expected_batch_size
+
+
+@then(parsers.parse('the throttle count is {expected_count:d}'))
+def _(expected_count: int, throttle: SBT2Blob.Throttle):
+    """the throttle count is <expected_count>."""
+    assert throttle.throttle_count == expected_count
+
+
+@then(parsers.parse('the number of messages loaded is {expected_count:d}'))
+def _(expected_count: int, loaded_count: int):
+    """the number of messages loaded is <expected_count>."""
+    assert loaded_count == expected_count
+
+
+@then(parsers.parse('the messages were abandoned {expected_count:d} times'))
+def _(expected_count: int, extractor: FakeExtractor):
+    """the messages were abandoned <expected_count> times."""
+    assert extractor.abandon_count == expected_count
+
+
+@then(parsers.parse('the throttle events counter is {expected_count:d}'))
+def _(expected_count: int):
+    """the throttle events counter is <expected_count>."""
+    assert sum(SBT2Blob.COUNTERS['throttle_events'].increments) == expected_count
+
+
+@then(parsers.parse('the backoff seconds counter was incremented {expected_count:d} times'))
+def _(expected_count: int):
+    """the backoff seconds counter was incremented <expected_count> times."""
+    assert len(SBT2Blob.COUNTERS['backoff_seconds'].increments) == expected_count
@@ -0,0 +1,56 @@
+"""Topic Configuration feature tests."""
+import json
+
+import pytest
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+
+
+@scenario('topic_config.feature', 'Per-Topic Overrides')
+def test_per_topic_overrides():
+    """Per-Topic Overrides."""
+
+
+@scenario('topic_config.feature', 'Invalid Configuration')
+def test_invalid_configuration():
+    """Invalid Configuration."""
+
+
+@given(parsers.parse('the environment variable {key} is {value}'))
+def _(key: str, value: str, monkeypatch: pytest.MonkeyPatch):
+    """the environment variable <key> is <value>."""
+    monkeypatch.setenv(key, value)
+
+
+@given(parsers.parse('the topics and subscriptions are {topics_and_subscriptions}'),
+       target_fixture='topics_and_subscriptions')
+def _(topics_and_subscriptions: str):
+    """the topics and subscriptions are <topics_and_subscriptions>."""
+    return [tuple(item.split(':')) for item in topics_and_subscriptions.split(',')]
+
+
+@given(parsers.parse('the configuration file is {config_file}'), target_fixture='config_file')
+def _(config_file: str):
+    """the configuration file is <config_file>."""
+    return json.loads(config_file)
+
+
+@when('the topic configurations are created', target_fixture='topic_configs')
+def _(topics_and_subscriptions: list, config_file: dict):
+    """the topic configurations are created."""
+    return SBT2Blob.topic_configs(topics_and_subscriptions, config_file)
+
+
+@then(parsers.parse('the {setting} for {topic_and_subscription} is {value}'))
+def _(setting: str, topic_and_subscription: str, value: str, topic_configs: list):
+    """the <setting> for <topic_and_subscription> is <value>."""
+    configs = {f'{config.topic_name}:{config.subscription_name}': config for config in topic_configs}
+    assert str(getattr(configs[topic_and_subscription], setting)) == value
+
+
+@then('creating the topic configurations raises a ValueError')
+def _(topics_and_subscriptions: list, config_file: dict):
+    """creating the topic configurations raises a ValueError."""
+    with pytest.raises(ValueError):
+        SBT2Blob.topic_configs(topics_and_subscriptions, config_file)
@@ -0,0 +1,46 @@
+"""Service Bus Trigger feature tests."""
+import datetime
+import types
+
+from pytest_bdd import given, parsers, scenario, then, when
+
+import SBT2Blob
+from SBT2BlobTrigger import DeliveredMessage
+
+
+@scenario('trigger.feature', 'Delivered Message')
+def test_delivered_message():
+    """Delivered Message."""
+
+
+@given(parsers.parse('a delivered message with the body {body}'), target_fixture='message')
+def _(body: str):
+    """a delivered message with the body <body>."""
+    properties = dict.fromkeys([
+        'content_type', 'dead_letter_error_description', 'dead_letter_reason', 'dead_letter_source',
+        'enqueued_sequence_number', 'partition_key', 'reply_to', 'reply_to_session_id',
+        'scheduled_enqueue_time_utc', 'session_id', 'subject', 'to'
+    ])
+    return types.SimpleNamespace(
+        get_body=body.encode,
+        application_properties={'colour': 'blue'},
+        correlation_id='my-correlation-id',
+        delivery_count=1,
+        enqueued_time_utc=datetime.datetime(2025, 2, 24, 15, 56),
+        message_id='42',
+        sequence_number=7,
+        time_to_live=datetime.timedelta(minutes=1),
+        **properties
+    )
+
+
+@when(parsers.parse('the delivered message is encoded with the {output_format} encoder'), target_fixture='data')
+def _(output_format: str, message: types.SimpleNamespace):
+    """the delivered message is encoded with the <output_format> encoder."""
+    return SBT2Blob.ENCODERS[output_format]().encode([DeliveredMessage(message)])
+
+
+@then(parsers.parse('the encoded data is {expected_data}'))
+def _(expected_data: str, data: bytes):
+    """the encoded data is <expected_data>."""
+    assert data == expected_data.encode() + b'\n'